@@ -1,6 +1,6 @@
 #!/bin/sh
 cd ./data/log
-rm -rf *.log *.csv *.png *.tmp
+rm -rf *.log *.csv *.npy *.png *.tmp *.ckpt *.zip *.json *.lock
 cd ../rabbitmq
 rm -R mnesia
 rm -rf .erlang.cookie
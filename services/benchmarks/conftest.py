@@ -0,0 +1,53 @@
+import itertools
+
+import pytest
+
+from meter.Meter import Meter
+from pv.PV import Pv
+
+TIME_ITER = 60
+ITERATIONS = 24 * 60 * 60 // TIME_ITER
+
+
+@pytest.fixture
+def meter_kwargs(tmp_path) -> dict:
+    return dict(broker_host="rabbitmq", broker_port="5672",
+                broker_queue="meter_simulator_bench", broker_username="guest",
+                broker_password="guest", pv_min=0, pv_max=9000,
+                time_iter=TIME_ITER, logfile=str(tmp_path / "meter.log"),
+                environment_pv="BENCH", delimiter=";", max_consume=14,
+                seed=1)
+
+
+@pytest.fixture
+def pv_kwargs(tmp_path) -> dict:
+    return dict(broker_host="rabbitmq", broker_port="5672",
+                broker_queue="meter_simulator_bench", broker_username="guest",
+                broker_password="guest", pv_min=0, pv_max=9000,
+                output_file=str(tmp_path / "output.csv"), delimiter=";",
+                logfile=str(tmp_path / "pv.log"), environment_pv="BENCH",
+                max_execute_time=60, time_iter=TIME_ITER,
+                execute_time_log=str(tmp_path / "execute_time.log"),
+                pv_sunrise_start=6, pv_sunrise_end=8, pv_zenith=14,
+                pv_sundown_start=20, pv_sundown_end=21, pv_light_eff_lw=0.1,
+                pv_light_eff_std=0.8125, pv_max_power=9000, plot_workers=0)
+
+
+@pytest.fixture
+def pv(pv_kwargs) -> Pv:
+    pv = Pv(**pv_kwargs)
+    yield pv
+    pv._stop()
+
+
+@pytest.fixture
+def meter(meter_kwargs) -> Meter:
+    return Meter(**meter_kwargs)
+
+
+@pytest.fixture
+def days():
+    """
+    New day number for every round, so every round writes a new file.
+    """
+    return itertools.count()
@@ -0,0 +1,39 @@
+import pytest
+
+from meter.Meter import Meter
+from pv.PV import Pv
+from pv.Simulation import InMemoryChannel
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.mark.parametrize("meter_options", [
+    dict(batch_size=1),
+    dict(batch_size=1, message_encoding="binary"),
+    dict(batch_size=60),
+    dict(batch_size=60, output_format="npy"),
+    dict(meter_count=1000),
+], ids=["text", "binary", "batch", "batch-npy", "fleet"])
+def test_day_throughput(benchmark, meter_kwargs, pv_kwargs, days,
+                        meter_options):
+    """
+    Meter publishes whole day through in-memory channel to PV simulator,
+    which writes the day file.
+    """
+    output_format = meter_options.pop("output_format", "csv")
+    meter = Meter(**meter_kwargs, **meter_options)
+    pv = Pv(**dict(pv_kwargs, output_format=output_format))
+
+    def simulate_day(meter_day: int):
+        channel = InMemoryChannel(pv)
+        meter.simulate_day(channel, meter_day)
+        if channel.error is not None:
+            raise channel.error
+
+    try:
+        benchmark.pedantic(simulate_day, setup=lambda: ((next(days),), {}),
+                           rounds=5)
+    finally:
+        pv._stop()
@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks.conftest import ITERATIONS
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_generate_meter(benchmark, meter):
+    benchmark(meter._generate_meter, ITERATIONS // 2)
+
+
+def test_generate_meter_day(benchmark, meter):
+    def generate_day():
+        for current_iteration in range(1, ITERATIONS + 1):
+            meter._generate_meter(current_iteration)
+
+    benchmark(generate_day)
+
+
+def test_generate_day_profile(benchmark, meter):
+    meter._rng = meter._make_rng(0)
+    benchmark(meter._generate_day_profile)
+
+
+def test_generate_fleet_meter(benchmark, meter):
+    meter._meter_count = 1000
+    meter._rng = meter._make_rng(0)
+    benchmark(meter._generate_fleet_meter, ITERATIONS // 2)
@@ -0,0 +1,78 @@
+import itertools
+
+import pytest
+
+from benchmarks.conftest import ITERATIONS
+from common.Protocol import decode_reading, encode_reading, get_content_type
+from pv.DayWriter import DayRecord
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+
+def test_generate_pv_value(benchmark, pv):
+    benchmark(pv._generate_pv_value, 0, ITERATIONS // 2)
+
+
+def test_generate_pv_value_day(benchmark, pv):
+    def generate_day():
+        for meter_iteration in range(1, ITERATIONS + 1):
+            pv._generate_pv_value(0, meter_iteration)
+
+    benchmark(generate_day)
+
+
+def test_parse_data_string(benchmark, pv):
+    benchmark(pv._parse_data_string, "0;720;4500")
+
+
+def test_parse_data_string_day(benchmark, pv):
+    data_strings = [f"0;{meter_iteration};4500"
+                    for meter_iteration in range(1, ITERATIONS + 1)]
+
+    def parse_day():
+        for data_string in data_strings:
+            pv._parse_data_string(data_string)
+
+    benchmark(parse_day)
+
+
+def test_decode_reading(benchmark):
+    benchmark(decode_reading, encode_reading("DATA", 0, 720, 4500))
+
+
+def test_handle_message(benchmark, pv):
+    pv._process_reading = lambda *reading: None
+    benchmark(pv._handle_message, b"DATA::0;720;4500")
+
+
+def test_handle_binary_message(benchmark, pv):
+    pv._process_reading = lambda *reading: None
+    benchmark(pv._handle_message, encode_reading("DATA", 0, 720, 4500),
+              get_content_type())
+
+
+def test_write_to_output(benchmark, pv):
+    iterations = itertools.count(1)
+
+    def write_record():
+        pv._write_to_output(0, DayRecord(next(iterations), -4500, 3000,
+                                         -1500), "DATA")
+
+    benchmark(write_record)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "npy"])
+def test_write_to_output_day(benchmark, pv, days, output_format):
+    pv._output_format = output_format
+    data_records = [DayRecord(meter_iteration, -4500, 3000, -1500)
+                    for meter_iteration in range(1, ITERATIONS + 1)]
+
+    def write_day(meter_day: int):
+        for data_record in data_records:
+            pv._write_to_output(meter_day, data_record, "DATA")
+        pv._close_output(meter_day)
+
+    benchmark.pedantic(write_day, setup=lambda: ((next(days),), {}),
+                       rounds=10)
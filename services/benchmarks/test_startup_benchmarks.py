@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from pv.PV import Pv
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+SERVICES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("module", ["pv.PV", "pv.__main__", "meter.Meter"])
+def test_import_time(benchmark, module):
+    """
+    Time of starting interpreter and importing service module.
+    """
+    benchmark.pedantic(subprocess.run,
+                       args=([sys.executable, "-c", f"import {module}"],),
+                       kwargs=dict(check=True, cwd=SERVICES), rounds=5)
+
+
+@pytest.mark.parametrize("plot_enabled", [True, False],
+                         ids=["plot", "no-plot"])
+def test_pv_init_time(benchmark, pv_kwargs, plot_enabled):
+    def make_pv():
+        pv = Pv(**dict(pv_kwargs, plot_enabled=plot_enabled))
+        pv._stop()
+
+    benchmark.pedantic(make_pv, rounds=5)
@@ -0,0 +1,28 @@
+import pytest
+
+from pv.PvConfig import PvConfig
+from pv.Sweep import make_grid, run_sweep
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+GRID = {"pv_zenith": [11, 12, 13, 14, 15],
+        "pv_max_power": [2000, 3000, 4000, 5000, 6000, 7000],
+        "pv_light_eff_std": [0.6, 0.7, 0.8, 0.9],
+        "pv_sunrise_start": [5, 6]}
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+@pytest.mark.parametrize("hours", [1, 25], ids=["240", "6000"])
+def test_sweep(benchmark, pv_kwargs, meter, workers, hours):
+    """
+    Energy balance of 240 and 6000 configurations of one meter day.
+    """
+    configs = make_grid(PvConfig(**pv_kwargs), dict(
+        GRID, pv_sundown_end=[21 + hour / 100 for hour in range(hours)]))
+    iterations, readings = meter.get_day_readings(0)
+    balances = benchmark.pedantic(run_sweep, args=(configs, iterations,
+                                                   readings, workers),
+                                  rounds=3)
+    assert len(balances) == len(configs)
@@ -0,0 +1,298 @@
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import time
+from collections import deque
+from typing import Callable, List, Tuple
+
+import pika
+
+from common.Metrics import REGISTRY
+
+RECONNECTS = REGISTRY.counter("broker_reconnects_total",
+                              "Connections to broker opened after a failure")
+BUFFERED = REGISTRY.gauge("broker_buffered_messages",
+                          "Messages waiting for broker to be available")
+SPILLED = REGISTRY.counter("broker_spilled_messages_total",
+                           "Buffered messages written to spill file")
+SPILL_LENGTH = struct.Struct("<I")
+
+
+class SpillBuffer:
+    """
+    FIFO of messages waiting for broker. Up to size messages are kept in
+    memory, further ones are appended to a temporary spill file in
+    directory and read back in order when the memory part is drained.
+    """
+
+    def __init__(self, size: int = 10000, directory: str = None):
+        self._size = max(size, 1)
+        self._directory = directory or None
+        self._memory = deque()
+        self._file = None
+        self._spilled = 0
+        self._read_offset = 0
+
+    def __len__(self) -> int:
+        return len(self._memory) + self._spilled
+
+    def append(self, message: tuple):
+        """
+        Adds message to the end of buffer.
+        """
+        if self._spilled or len(self._memory) >= self._size:
+            self._spill(message)
+        else:
+            self._memory.append(message)
+
+    def peek(self) -> tuple:
+        """
+        Returns the first message without removing it.
+        """
+        if not self._memory:
+            self._refill()
+        return self._memory[0]
+
+    def prepend(self, messages: List[tuple]):
+        """
+        Puts messages in their order before the first message, e.g.
+        messages in flight when connection was lost.
+        """
+        self._memory.extendleft(reversed(messages))
+
+    def popleft(self) -> tuple:
+        """
+        Removes and returns the first message.
+        """
+        if not self._memory:
+            self._refill()
+        return self._memory.popleft()
+
+    def _spill(self, message: tuple):
+        if self._file is None:
+            if self._directory is not None:
+                os.makedirs(self._directory, exist_ok=True)
+            self._file = tempfile.TemporaryFile(dir=self._directory)
+        data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(SPILL_LENGTH.pack(len(data)) + data)
+        self._spilled += 1
+        SPILLED.inc()
+
+    def _refill(self):
+        """
+        Reads spilled messages back to memory, the file is emptied when all
+        of them are read.
+        """
+        if not self._spilled:
+            return
+        self._file.seek(self._read_offset)
+        while self._spilled and len(self._memory) < self._size:
+            length, = SPILL_LENGTH.unpack(self._file.read(SPILL_LENGTH.size))
+            self._memory.append(pickle.loads(self._file.read(length)))
+            self._spilled -= 1
+        self._read_offset = self._file.tell()
+        if not self._spilled:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_offset = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BrokerConnection:
+    """
+    Blocking connection to broker which is opened again after failures.
+    Failed attempts are repeated after exponential backoff from
+    initial_delay up to max_delay seconds. Every connection opens a
+    channel with prefetch_count and publisher confirms, and declares
+    queues.
+    basic_publish() has the same arguments as channel's one, so the
+    connection can be used instead of a channel: messages published while
+    broker is unavailable are kept in a SpillBuffer of buffer_size messages
+    in memory and the rest in spill_directory, and published in order
+    when the connection is back. A message whose publish failed is kept
+    too, so it may be delivered twice but is never lost.
+    """
+
+    def __init__(self, parameters: pika.ConnectionParameters,
+                 queues: List[Tuple[str, dict]], name: str,
+                 prefetch_count: int = 0,
+                 confirm: bool = False, initial_delay: float = 1.0,
+                 max_delay: float = 30.0, buffer_size: int = 10000,
+                 spill_directory: str = None,
+                 connection_factory: Callable = pika.BlockingConnection,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self._parameters = parameters
+        self._queues = queues
+        self._name = name
+        self._prefetch_count = prefetch_count
+        self._confirm = confirm
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._delay = initial_delay
+        self._next_attempt = 0.0
+        self._connected_before = False
+        self._connection_factory = connection_factory
+        self._clock = clock
+        self._sleep = sleep
+        self._buffer = SpillBuffer(buffer_size, spill_directory)
+        self._channel = None
+        self.connection = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection is not None and self.connection.is_open
+
+    def connect(self, attempts: int = 1):
+        """
+        Opens connection and channel, declares queues and publishes
+        buffered messages. Waits with backoff between failed attempts,
+        attempts None tries until connected. Returns the channel, raises
+        error of the last attempt.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._open()
+            except pika.exceptions.AMQPError as e:
+                attempt += 1
+                if attempts is not None and attempt >= attempts:
+                    self._next_attempt = self._clock() + self._next_delay()
+                    raise
+                delay = self._next_delay()
+                logging.error("%s: Connection to broker failed: %s, "
+                              "retrying in %.1f seconds", self._name, e, delay)
+                self._sleep(delay)
+
+    def _open(self):
+        self._reset()
+        connection, channel = self._open_channel()
+        self.connection = connection
+        self._channel = channel
+        self._delay = self._initial_delay
+        if self._connected_before:
+            RECONNECTS.inc()
+            logging.warning("%s: Reconnected to broker", self._name)
+        else:
+            logging.info("%s: Connected to broker", self._name)
+        self._connected_before = True
+        self.flush()
+        return channel
+
+    def _open_channel(self) -> tuple:
+        """
+        Opens connection and channel and declares queues. Returns
+        connection and channel.
+        """
+        connection = self._connection_factory(self._parameters)
+        try:
+            channel = connection.channel()
+            if self._prefetch_count:
+                channel.basic_qos(prefetch_count=self._prefetch_count)
+            if self._confirm:
+                channel.confirm_delivery()
+            for queue, arguments in self._queues:
+                channel.queue_declare(queue=queue, durable=True,
+                                      arguments=arguments)
+        except Exception:
+            self._close_quietly(connection)
+            raise
+        return connection, channel
+
+    def _next_delay(self) -> float:
+        delay = self._delay
+        self._delay = min(self._delay * 2, self._max_delay)
+        return delay
+
+    def basic_publish(self, exchange: str, routing_key: str, body,
+                      properties: pika.BasicProperties = None):
+        """
+        Publishes message after buffered ones, keeps it in buffer while
+        broker is unavailable.
+        """
+        self._buffer.append((exchange, routing_key, body, properties))
+        self.flush()
+
+    def flush(self) -> bool:
+        """
+        Publishes buffered messages in order. When the connection is lost
+        it is opened again once backoff delay passed. Returns True when
+        all messages are published.
+        """
+        if not self.is_open and not self._reconnect():
+            BUFFERED.set(len(self._buffer))
+            return False
+        while self._buffer:
+            exchange, routing_key, body, properties = self._buffer.peek()
+            try:
+                self._channel.basic_publish(
+                    exchange=exchange, routing_key=routing_key, body=body,
+                    properties=properties)
+            except pika.exceptions.AMQPError as e:
+                logging.error("%s: Can't publish to broker: %s", self._name,
+                              e)
+                self._reset()
+                break
+            self._buffer.popleft()
+        BUFFERED.set(len(self._buffer))
+        return not self._buffer
+
+    def wait_confirmed(self) -> bool:
+        """
+        Publishes buffered messages and waits until broker confirms them.
+        Returns True when all messages are confirmed. Every publish to
+        blocking channel is confirmed at once.
+        """
+        return self.flush()
+
+    def _reconnect(self) -> bool:
+        """
+        Makes one attempt to connect when backoff delay passed.
+        """
+        if self._clock() < self._next_attempt:
+            return False
+        try:
+            self._open()
+        except pika.exceptions.AMQPError as e:
+            delay = self._next_delay()
+            self._next_attempt = self._clock() + delay
+            logging.error("%s: Connection to broker failed: %s, "
+                          "retrying in %.1f seconds", self._name, e, delay)
+            return False
+        return True
+
+    def _reset(self):
+        """
+        Drops connection, the next reconnect attempt is made at once.
+        """
+        if self.connection is not None:
+            self._close_quietly(self.connection)
+            self._next_attempt = 0.0
+        self.connection = None
+        self._channel = None
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            if connection.is_open:
+                connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Publishes buffered messages and closes connection. Messages which
+        still can't be published are lost.
+        """
+        if self._buffer and not self.flush():
+            logging.error("%s: %d buffered messages are not published",
+                          self._name, len(self._buffer))
+        self._reset()
+        self._buffer.close()
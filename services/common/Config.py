@@ -0,0 +1,39 @@
+import os
+from typing import Any, Dict, List, Mapping, Union, get_args, get_origin
+
+
+def parse_value(value: str, annotation: Any) -> Any:
+    """
+    Converts value of environment variable to type of config field:
+    bool is "1", lists are comma separated, empty value of optional field
+    is None.
+    """
+    if get_origin(annotation) is Union:
+        if not value:
+            return None
+        annotation = [arg for arg in get_args(annotation)
+                      if arg is not type(None)][0]
+    if get_origin(annotation) in (list, List):
+        item_type = get_args(annotation)[0]
+        return [item_type(item) for item in value.split(",") if item]
+    if annotation is bool:
+        return value == "1"
+    return annotation(value)
+
+
+def read_environment(config_class, names: Dict[str, str] = None,
+                     environ: Mapping[str, str] = None):
+    """
+    Makes config of NamedTuple config_class from environment. Every field
+    is read from variable of its upper case name, or of its name in names,
+    fields of unset variables keep their defaults.
+    """
+    names = names or {}
+    environ = os.environ if environ is None else environ
+    values = {}
+    for field, annotation in config_class.__annotations__.items():
+        value = environ.get(names.get(field, field.upper()))
+        if value is not None:
+            values[field] = parse_value(value, annotation)
+    return config_class(**values)
+
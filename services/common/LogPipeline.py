@@ -0,0 +1,111 @@
+import atexit
+import json
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S %p'
+
+_listener = None
+_queue_handler = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes every sample_rate-th record and at most rate_limit records per
+    second (0 is unlimited). Warnings and errors always pass.
+    """
+
+    def __init__(self, sample_rate: int = 1, rate_limit: int = 0):
+        super().__init__()
+        self._sample_rate = max(sample_rate, 1)
+        self._rate_limit = rate_limit
+        self._count = 0
+        self._second = 0
+        self._second_count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        self._count += 1
+        if self._count % self._sample_rate:
+            return False
+        if self._rate_limit:
+            second = int(time.monotonic())
+            if second != self._second:
+                self._second = second
+                self._second_count = 0
+            if self._second_count >= self._rate_limit:
+                return False
+            self._second_count += 1
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats record as one compact JSON line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {"time": self.formatTime(record, self.datefmt),
+                "level": record.levelname, "message": record.getMessage()}
+        if record.exc_info:
+            line["exc"] = self.formatException(record.exc_info)
+        return json.dumps(line, separators=(",", ":"))
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queue handler passing records unformatted, so message is built
+    by the listener thread instead of the logging thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(logfile: str, sample_rate: int = 1, rate_limit: int = 0,
+                  log_format: str = "text"):
+    """
+    Configures root logger to pass records through a queue to a file
+    written by a background listener. Does nothing when logging is already
+    configured, like logging.basicConfig().
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    file_handler = logging.FileHandler(logfile, mode="a")
+    if log_format == "json":
+        file_handler.setFormatter(JsonFormatter(datefmt=LOG_DATE_FORMAT))
+    else:
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT,
+                                                    LOG_DATE_FORMAT))
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate, rate_limit))
+    root.addHandler(queue_handler)
+    root.setLevel(logging.INFO)
+    _listener = QueueListener(log_queue, file_handler)
+    _listener.start()
+    _queue_handler = queue_handler
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Stops listener of setup_logging after it writes queued records and
+    removes its handlers, so logging can be configured again. Worker
+    processes of a pool exit without atexit and must call it themselves.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
@@ -0,0 +1,240 @@
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0,
+                   5.0, 10.0)
+
+
+class Metric:
+    """
+    Base of metrics. Metrics with the same name and different labels are
+    series of one metric.
+    """
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Dict[str, str]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels or {}
+        self._lock = threading.Lock()
+
+    def _format_labels(self, extra: Dict[str, str] = None) -> str:
+        labels = dict(self.labels, **(extra or {}))
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"'
+                              for key, value in labels.items()) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Value which only grows, e.g. quantity of messages.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Dict[str, str]):
+        super().__init__(name, help_text, labels)
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._format_labels()} {self.value}"]
+
+
+class Gauge(Metric):
+    """
+    Value which goes up and down, e.g. depth of queue.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Dict[str, str]):
+        super().__init__(name, help_text, labels)
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._format_labels()} {self.value}"]
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, e.g. durations in seconds.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Dict[str, str],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self._buckets = buckets
+        self._counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for index, bucket in enumerate(self._buckets):
+                if value <= bucket:
+                    self._counts[index] += 1
+                    break
+
+    def time(self) -> "Timer":
+        """
+        Returns context manager observing duration of its block.
+        """
+        return Timer(self)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            counts = list(self._counts)
+            count = self.count
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bucket, bucket_count in zip(self._buckets, counts):
+            cumulative += bucket_count
+            samples.append(f"{self.name}_bucket"
+                           f"{self._format_labels({'le': bucket})} "
+                           f"{cumulative}")
+        samples.append(f"{self.name}_bucket"
+                       f"{self._format_labels({'le': '+Inf'})} {count}")
+        samples.append(f"{self.name}_sum{self._format_labels()} {total}")
+        samples.append(f"{self.name}_count{self._format_labels()} {count}")
+        return samples
+
+
+class Timer:
+    """
+    Context manager observing duration of its block in a histogram.
+    """
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str,
+                labels: Dict[str, str] = None) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str,
+              labels: Dict[str, str] = None) -> Gauge:
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str,
+                  labels: Dict[str, str] = None,
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """
+        Returns all metrics in Prometheus text format.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port: int,
+                         registry: MetricsRegistry = REGISTRY
+                         ) -> ThreadingHTTPServer:
+    """
+    Serves metrics on http://0.0.0.0:port/metrics from background thread.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type",
+                             "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="MetricsServer",
+                     daemon=True).start()
+    return server
+
+
+def start_metrics_file(filename: str, interval: float,
+                       registry: MetricsRegistry = REGISTRY
+                       ) -> threading.Event:
+    """
+    Writes metrics to filename every interval seconds from background
+    thread. Returns event stopping the writer.
+    """
+    stopped = threading.Event()
+
+    def write_metrics():
+        while not stopped.wait(interval):
+            try:
+                with open(filename + ".tmp", "w") as metrics_file:
+                    metrics_file.write(registry.render())
+                os.replace(filename + ".tmp", filename)
+            except OSError as e:
+                logging.error("Can't write metrics to %s: %s", filename, e)
+
+    threading.Thread(target=write_metrics, name="MetricsFile",
+                     daemon=True).start()
+    return stopped
+
+
+def start_metrics(port: int, filename: str, interval: float):
+    """
+    Starts metrics endpoint when port is given and metrics file when
+    filename is given.
+    """
+    if port:
+        start_metrics_server(port)
+    if filename:
+        start_metrics_file(filename, interval)
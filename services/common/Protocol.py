@@ -0,0 +1,55 @@
+import struct
+from typing import Tuple
+
+import numpy as np
+
+PROTOCOL_VERSION = 1
+CONTENT_TYPE = "application/x-pv-reading"
+READING = struct.Struct("<BBIIi")
+COMMANDS = {"START": 1, "DATA": 2, "END": 3}
+COMMAND_NAMES = {code: command for command, code in COMMANDS.items()}
+BATCH_COMMAND = b"BATCH::"
+BATCH_HEADER = struct.Struct("<II")
+BATCH_READING = struct.Struct("<Ii")
+FLEET_COMMAND = b"FLEET::"
+FLEET_HEADER = struct.Struct("<IIII")
+FLEET_READING = np.dtype("<i4")
+
+
+def get_content_type(version: int = PROTOCOL_VERSION) -> str:
+    """
+    Returns AMQP content type of binary readings of protocol version.
+    """
+    return f"{CONTENT_TYPE}; version={version}"
+
+
+def is_binary(content_type: str) -> bool:
+    """
+    Returns True when message of content_type is a binary reading.
+    """
+    return content_type is not None and content_type.startswith(CONTENT_TYPE)
+
+
+def encode_reading(command: str, day: int, iteration: int,
+                   value: int) -> bytes:
+    """
+    Packs START, DATA or END message to fixed layout: version, command,
+    day, iteration, value. START carries its timestamp as iteration.
+    """
+    return READING.pack(PROTOCOL_VERSION, COMMANDS[command], day, iteration,
+                        value)
+
+
+def decode_reading(body: bytes) -> Tuple[str, int, int, int]:
+    """
+    Unpacks binary message to command, day, iteration and value.
+    """
+    if len(body) != READING.size:
+        raise ValueError(f"Binary reading has {len(body)} bytes, "
+                         f"expected {READING.size}")
+    version, command, day, iteration, value = READING.unpack(body)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version {version}")
+    if command not in COMMAND_NAMES:
+        raise ValueError(f"Unknown command {command}")
+    return COMMAND_NAMES[command], day, iteration, value
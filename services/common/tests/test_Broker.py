@@ -0,0 +1,118 @@
+import tempfile
+import unittest
+
+import pika
+
+from common.Broker import BrokerConnection, SpillBuffer
+
+
+class FakeChannel:
+    def __init__(self, broker: "FakeBroker"):
+        self._broker = broker
+
+    def basic_qos(self, prefetch_count: int):
+        pass
+
+    def confirm_delivery(self):
+        pass
+
+    def queue_declare(self, queue: str, durable: bool, arguments: dict):
+        self._broker.declared.append(queue)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        if not self._broker.up:
+            raise pika.exceptions.StreamLostError("Broker is down")
+        self._broker.published.append((self, body))
+
+
+class FakeBroker:
+    """
+    Broker which can go down, its connections fail while it is down.
+    """
+
+    def __init__(self):
+        self.up = True
+        self.connections = 0
+        self.declared = []
+        self.published = []
+        self.is_open = True
+
+    def connect(self, parameters):
+        if not self.up:
+            raise pika.exceptions.AMQPConnectionError("Connection refused")
+        self.connections += 1
+        return self
+
+    def channel(self) -> FakeChannel:
+        return FakeChannel(self)
+
+    def close(self):
+        pass
+
+    def bodies(self) -> list:
+        return [body for channel, body in self.published]
+
+
+class testSpillBuffer(unittest.TestCase):
+    """
+    Class for testing buffer of messages spilling to disk.
+    """
+
+    def test_order(self):
+        with tempfile.TemporaryDirectory() as directory:
+            buffer = SpillBuffer(2, directory)
+            for message in range(5):
+                buffer.append((message,))
+            assert len(buffer) == 5
+            assert [buffer.popleft() for _ in range(3)] == [(0,), (1,), (2,)]
+            buffer.append((5,))
+            assert buffer.peek() == (3,)
+            assert [buffer.popleft() for _ in range(len(buffer))] == [
+                (3,), (4,), (5,)]
+            buffer.append((6,))
+            assert buffer.popleft() == (6,)
+            buffer.close()
+
+
+class testBrokerConnection(unittest.TestCase):
+    """
+    Class for testing reconnecting connection to broker.
+    """
+
+    def setUp(self):
+        self.broker = FakeBroker()
+        self.now = 0.0
+        self.sleeps = []
+        self.connection = BrokerConnection(
+            None, [("queue", None)], "Test", initial_delay=1.0,
+            max_delay=4.0, buffer_size=2,
+            connection_factory=self.broker.connect, clock=lambda: self.now,
+            sleep=self.sleeps.append)
+
+    def test_connect_backoff(self):
+        self.broker.up = False
+        with self.assertRaises(pika.exceptions.AMQPConnectionError):
+            self.connection.connect(attempts=5)
+        assert self.sleeps == [1.0, 2.0, 4.0, 4.0]
+
+    def test_buffer_while_down(self):
+        self.connection.connect()
+        self.broker.up = False
+        for body in range(5):
+            self.connection.basic_publish("", "queue", body)
+            self.now += 1.5
+        assert self.broker.bodies() == []
+        self.broker.up = True
+        assert not self.connection.flush()
+        self.now += 4.0
+        assert self.connection.flush()
+        assert self.broker.bodies() == [0, 1, 2, 3, 4]
+        assert self.broker.connections == 2
+
+    def test_publish(self):
+        channel = self.connection.connect()
+        self.connection.basic_publish("", "queue", 0)
+        self.connection.basic_publish("", "queue", 1)
+        assert self.broker.bodies() == [0, 1]
+        assert self.broker.published[0][0] is channel
+        assert self.broker.declared == ["queue"]
@@ -0,0 +1,38 @@
+import unittest
+from typing import List, NamedTuple, Optional
+
+from common.Config import parse_value, read_environment
+
+
+class Settings(NamedTuple):
+    name: str = "meter"
+    count: int = 1
+    rate: float = 0.5
+    enabled: bool = True
+    seed: Optional[int] = None
+    shards: Optional[List[int]] = None
+
+
+class testConfig(unittest.TestCase):
+    """
+    Class for testing configs read from environment.
+    """
+
+    def test_parse_value(self):
+        assert parse_value("7", int) == 7
+        assert parse_value("0.25", float) == 0.25
+        assert parse_value("0", bool) is False
+        assert parse_value("", Optional[int]) is None
+        assert parse_value("1,3", Optional[List[int]]) == [1, 3]
+
+    def test_read_environment(self):
+        settings = read_environment(
+            Settings, {"shards": "PV_SHARDS"},
+            {"COUNT": "3", "ENABLED": "0", "SEED": "42", "PV_SHARDS": "0,2",
+             "SHARDS": "5"})
+        assert settings == Settings("meter", 3, 0.5, False, 42, [0, 2])
+
+    def test_defaults(self):
+        assert read_environment(Settings, environ={}) == Settings()
+        with self.assertRaises(AttributeError):
+            Settings().count = 2
@@ -0,0 +1,63 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from common.LogPipeline import (JsonFormatter, SamplingFilter, setup_logging,
+                                stop_logging)
+
+
+def make_record(level: int, message: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, message, args, None)
+
+
+class testLogPipeline(unittest.TestCase):
+    """
+    Class for testing logging pipeline.
+    """
+
+    def test_sampling(self):
+        sampling = SamplingFilter(sample_rate=3)
+        passed = [sampling.filter(make_record(logging.INFO, "PV: %s", i))
+                  for i in range(9)]
+        assert passed.count(True) == 3
+
+    def test_rate_limit(self):
+        sampling = SamplingFilter(rate_limit=5)
+        passed = [sampling.filter(make_record(logging.INFO, "PV: %s", i))
+                  for i in range(100)]
+        assert 5 <= passed.count(True) <= 10
+
+    def test_errors_pass(self):
+        sampling = SamplingFilter(sample_rate=1000, rate_limit=1)
+        assert all(sampling.filter(make_record(logging.ERROR, "PV: Error"))
+                   for i in range(10))
+
+    def test_json(self):
+        line = JsonFormatter().format(
+            make_record(logging.INFO, "PV: Received message %s", b"1;1;1"))
+        assert json.loads(line)["message"] == "PV: Received message b'1;1;1'"
+        assert json.loads(line)["level"] == "INFO"
+
+    def test_stop_logging(self):
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        root.handlers.clear()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                logfile = os.path.join(directory, "test.log")
+                setup_logging(logfile)
+                logging.info("PV: Stopped")
+                stop_logging()
+                assert not root.handlers
+                with open(logfile) as log_file:
+                    assert log_file.read().endswith("PV: Stopped\n")
+                stop_logging()
+        finally:
+            root.handlers[:] = handlers
+            root.setLevel(level)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+import unittest
+from urllib.request import urlopen
+
+from common.Metrics import (MetricsRegistry, start_metrics_file,
+                            start_metrics_server)
+
+
+class testMetrics(unittest.TestCase):
+    """
+    Class for testing metrics.
+    """
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.counter("messages_total", "Messages",
+                                        {"command": "DATA"})
+        counter.inc()
+        counter.inc(2)
+        assert 'messages_total{command="DATA"} 3' in self.registry.render()
+
+    def test_histogram(self):
+        histogram = self.registry.histogram("stage_seconds", "Stage",
+                                            buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        with histogram.time():
+            pass
+        lines = self.registry.render().splitlines()
+        assert '# TYPE stage_seconds histogram' in lines
+        assert 'stage_seconds_bucket{le="0.1"} 2' in lines
+        assert 'stage_seconds_bucket{le="1.0"} 3' in lines
+        assert 'stage_seconds_bucket{le="+Inf"} 4' in lines
+        assert 'stage_seconds_count 4' in lines
+
+    def test_series_described_once(self):
+        self.registry.gauge("depth", "Depth", {"queue": "a"}).set(1)
+        self.registry.gauge("depth", "Depth", {"queue": "b"}).set(2)
+        render = self.registry.render()
+        assert render.count("# TYPE depth gauge") == 1
+        assert 'depth{queue="b"} 2' in render
+
+    def test_server(self):
+        self.registry.counter("served_total", "Served").inc()
+        server = start_metrics_server(0, self.registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/metrics"
+            with urlopen(url) as response:
+                assert b"served_total 1" in response.read()
+        finally:
+            server.shutdown()
+
+    def test_file(self):
+        self.registry.counter("written_total", "Written").inc()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "metrics.prom")
+            stopped = start_metrics_file(filename, 0.01, self.registry)
+            try:
+                deadline = time.monotonic() + 5
+                while not os.path.exists(filename) and \
+                        time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                stopped.set()
+            with open(filename) as metrics_file:
+                assert "written_total 1" in metrics_file.read()
+
+
+if __name__ == "__main__":
+    unittest.main()
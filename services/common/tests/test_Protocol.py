@@ -0,0 +1,35 @@
+import unittest
+
+from common.Protocol import (READING, decode_reading, encode_reading,
+                             get_content_type, is_binary)
+
+
+class testProtocol(unittest.TestCase):
+    """
+    Class for testing binary message encoding.
+    """
+
+    def test_encode_decode(self):
+        body = encode_reading("DATA", 3, 1440, 8999)
+        assert len(body) == READING.size
+        assert decode_reading(body) == ("DATA", 3, 1440, 8999)
+        assert decode_reading(encode_reading("START", 1, 1700000000, 0)) == \
+               ("START", 1, 1700000000, 0)
+
+    def test_content_type(self):
+        assert is_binary(get_content_type())
+        assert not is_binary(None)
+        assert not is_binary("text/plain")
+
+    def test_decode_errors(self):
+        body = encode_reading("END", 1, 2, 0)
+        with self.assertRaises(ValueError):
+            decode_reading(body[:-1])
+        with self.assertRaises(ValueError):
+            decode_reading(b"\x02" + body[1:])
+        with self.assertRaises(ValueError):
+            decode_reading(body[:1] + b"\x09" + body[2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,30 @@ import logging
 import time
 from datetime import datetime
 from random import randint
+from typing import List, Tuple
 
+import numpy as np
 import pika
 
+from common.Broker import BrokerConnection
+from common.LogPipeline import setup_logging
+from common.Metrics import REGISTRY, start_metrics
+from common.Protocol import (BATCH_COMMAND, BATCH_HEADER, BATCH_READING,
+                             FLEET_COMMAND, FLEET_HEADER, FLEET_READING,
+                             encode_reading, get_content_type)
+from meter.MeterConfig import MeterConfig
+from meter.PipelinedPublisher import PipelinedBrokerConnection
+from meter.Scheduler import Scheduler, read_day_file
+
+PUBLISHED = REGISTRY.counter("meter_messages_total",
+                             "Messages published to broker")
+PUBLISH_ERRORS = REGISTRY.counter("meter_publish_errors_total",
+                                  "Messages failed to publish")
+PUBLISH_SECONDS = REGISTRY.histogram("meter_publish_seconds",
+                                     "Time of publishing message to broker")
+UNCONFIRMED = REGISTRY.gauge("meter_unconfirmed_messages",
+                             "Published messages waiting for confirm")
+
 
 class Meter:
     """
@@ -12,13 +33,52 @@ class Meter:
     pv_min and pv_max (Watt) and publishes value to broker.
     Should provide broker's host, port, queue, username, password.
     Class publishes meter's value every time_iter seconds.
+    With batch_size > 1 readings are packed into binary BATCH messages
+    of up to batch_size readings, flushed at least every
+    batch_flush_interval seconds.
+    With shard_count > 1 messages of each day are routed to queue
+    "<broker_queue>.<day % shard_count>", so days are processed by
+    several PV simulators.
+    With meter_count > 1 class simulates a fleet of meters with IDs
+    0..meter_count - 1. Readings of all meters of one iteration are
+    generated at once and published as one binary FLEET message.
+    With publish_window > 1 up to publish_window messages wait for
+    publisher confirm at once instead of one, END of a day is published
+    when all readings are confirmed.
+    Readings of a whole day are generated at once from a random generator,
+    which is seeded with (seed, day) when seed is given, so runs are
+    reproducible.
+    Meter starts from day resume_day and iteration resume_iteration, e.g.
+    from the checkpoint of PV simulator after a failure.
+    With message_encoding "binary" START, DATA and END messages are packed
+    to fixed layout of common.Protocol and marked with its content type,
+    instead of "COMMAND::day;iteration;value" text.
+    With speedup > 0 iterations are paced at speedup times real time,
+    speedup 0 publishes as fast as possible. With replay_file readings of
+    every day are replayed from recorded day file of PV simulator.
+    Lost connection to broker is opened again with backoff from
+    broker_reconnect_delay up to broker_reconnect_max_delay seconds, while
+    readings are buffered, broker_buffer_size of them in memory and the
+    rest in a file in broker_spill_dir (temporary directory by default).
     """
 
     def __init__(self, broker_host: str, broker_port: int, broker_queue: str,
                  broker_username: str,
                  broker_password: str, pv_min: int, pv_max: int,
                  time_iter: int, logfile: str, environment_pv: str,
-                 delimiter: str, max_consume: int):
+                 delimiter: str, max_consume: int, batch_size: int = 1,
+                 batch_flush_interval: float = 1.0, shard_count: int = 1,
+                 meter_count: int = 1, seed: int = None, log_sample_rate: int = 1,
+                 log_rate_limit: int = 0, log_format: str = "text",
+                 publish_window: int = 1, metrics_port: int = 0,
+                 metrics_file: str = None, metrics_interval: float = 10.0,
+                 resume_day: int = 0, resume_iteration: int = 1,
+                 message_encoding: str = "text", speedup: float = 0,
+                 replay_file: str = None,
+                 broker_reconnect_delay: float = 1.0,
+                 broker_reconnect_max_delay: float = 30.0,
+                 broker_buffer_size: int = 10000,
+                 broker_spill_dir: str = None):
 
         self._logfile = logfile
         self._broker_host = broker_host
@@ -35,24 +95,82 @@ class Meter:
         self._environment_pv = environment_pv
         self._delimiter = delimiter
         self._max_consume = max_consume
-        logging.basicConfig(filename=logfile, filemode="a", level=logging.INFO,
-                            format='%(asctime)s %(message)s',
-                            datefmt='%Y-%m-%d %H:%M:%S %p')
+        self._batch_size = batch_size
+        self._batch_flush_interval = batch_flush_interval
+        self._batch = []
+        self._batch_flushed_at = time.monotonic()
+        self._shard_count = shard_count
+        self._current_day = 0
+        self._meter_count = meter_count
+        self._broker = None
+        self._broker_reconnect_delay = broker_reconnect_delay
+        self._broker_reconnect_max_delay = broker_reconnect_max_delay
+        self._broker_buffer_size = broker_buffer_size
+        self._broker_spill_dir = broker_spill_dir
+        self._seed = seed
+        self._rng = self._make_rng(self._current_day)
+        self._day_profile = None
+        self._publish_window = publish_window
+        self._metrics_port = metrics_port
+        self._metrics_file = metrics_file
+        self._metrics_interval = metrics_interval
+        self._resume_day = resume_day
+        self._resume_iteration = resume_iteration
+        if message_encoding not in ("text", "binary"):
+            raise ValueError(f"Unknown message encoding {message_encoding}, "
+                             f"expected text or binary")
+        self._message_encoding = message_encoding
+        self._speedup = speedup
+        self._scheduler = Scheduler(time_iter, speedup)
+        self._replay = None
+        if replay_file:
+            if meter_count > 1:
+                raise ValueError("Day file can be replayed by a single meter")
+            self._replay = read_day_file(replay_file, delimiter)
+        setup_logging(logfile, log_sample_rate, log_rate_limit, log_format)
+
+    @classmethod
+    def from_config(cls, config: MeterConfig) -> "Meter":
+        """
+        Makes meter simulator of config.
+        """
+        return cls(**config._asdict())
 
-    def _connect_broker(self):
+    def _get_broker(self, parameters: pika.ConnectionParameters
+                    ) -> BrokerConnection:
         """
-        Connects to broker and returns channel.
+        Returns connection manager of queues, creating it on first use.
+        With publish window it publishes through pipelined publisher.
+        """
+        if self._broker is None:
+            kwargs = dict(initial_delay=self._broker_reconnect_delay,
+                          max_delay=self._broker_reconnect_max_delay,
+                          buffer_size=self._broker_buffer_size,
+                          spill_directory=self._broker_spill_dir)
+            if self._publish_window > 1:
+                self._broker = PipelinedBrokerConnection(
+                    parameters, self._get_queues(), "Meter",
+                    window=self._publish_window, **kwargs)
+            else:
+                self._broker = BrokerConnection(
+                    parameters, self._get_queues(), "Meter", confirm=True,
+                    **kwargs)
+        return self._broker
+
+    def _connect_broker(self, attempts: int = 1):
+        """
+        Connects to broker and returns channel, attempts None retries until
+        connected. The channel is the connection manager, which buffers
+        readings while broker is unavailable.
         """
         logging.info("Meter: Connecting to broker: %s", self._broker_host)
+        parameters = pika.ConnectionParameters(host=self._broker_host,
+                                               port=self._broker_port,
+                                               credentials=self._credentials)
         try:
-            self._connection = pika.BlockingConnection(
-                pika.ConnectionParameters(host=self._broker_host,
-                                          port=self._broker_port,
-                                          credentials=self._credentials))
-            channel = self._connection.channel()
-            channel.queue_declare(queue=self._broker_queue, durable=True)
-            channel.confirm_delivery()
-            return channel
+            self._connection = self._get_broker(parameters)
+            self._connection.connect(attempts)
+            return self._connection
         except pika.exceptions.ConnectionClosedByBroker as e:
             logging.error("Meter: Connection to broker closed by broker: %s", e)
         except pika.exceptions.AMQPConnectionError as e:
@@ -66,37 +184,96 @@ class Meter:
         Coneects to broker and starts meter simulator.
         """
         logging.info("Meter: Connecting to broker: %s", self._broker_host)
-        channel = self._connect_broker()
+        start_metrics(self._metrics_port, self._metrics_file,
+                      self._metrics_interval)
+        channel = self._connect_broker(attempts=None)
         if channel is not None:
-            self._current_day = 0
-
-            while True:
-                data_to_send = f"START::{int(datetime.now().timestamp())}"
-                try:
-                    self._publish_meter_to_broker(channel, data_to_send)
-                except KeyboardInterrupt:
-                    logging.info("Meter: Exiting meter simulator")
-                    break
-                self._current_iteration = 1
-                while self._current_iteration <= self._total_iterations:
-                    try:
-                        meter = self._generate_meter(self._current_iteration)
-                        data_to_send = f"DATA::"\
-                                f"{self._make_string_to_broker(meter)}"
-                        self._publish_meter_to_broker(channel, data_to_send)
-                        self._current_iteration += 1
-                    except KeyboardInterrupt:
-                        logging.info("Meter: Exiting meter simulator")
-                        break
-                data_to_send = f"END::{self._make_string_to_broker(0)}"
-                try:
-                    self._publish_meter_to_broker(channel, data_to_send)
-                except KeyboardInterrupt:
-                    logging.info("Meter: Exiting meter simulator")
-                    break
-                self._current_day += 1
-                time.sleep(3)
-        self._connection.close()
+            self._current_day = self._resume_day
+            first_iteration = self._resume_iteration
+            if self._current_day or first_iteration > 1:
+                logging.info("Meter: Resuming day %s from iteration %s",
+                             self._current_day, first_iteration)
+            try:
+                while True:
+                    self._run_day(channel, first_iteration)
+                    first_iteration = 1
+                    self._current_day += 1
+                    if not self._speedup:
+                        time.sleep(3)
+            except KeyboardInterrupt:
+                logging.info("Meter: Exiting meter simulator")
+            self._connection.close()
+
+    def simulate_day(self, channel, day: int):
+        """
+        Publishes one day to channel without connecting to broker,
+        e.g. to in-memory channel of offline simulation.
+        """
+        self._current_day = day
+        self._run_day(channel)
+
+    def _run_day(self, channel, first_iteration: int = 1):
+        """
+        Publishes START, readings of iterations from first_iteration and END
+        of current day. Readings of a seeded day are the same when the day
+        is resumed from first_iteration > 1.
+        """
+        self._publish_command(channel, "START",
+                              int(datetime.now().timestamp()))
+        self._rng = self._make_rng(self._current_day)
+        iterations = range(first_iteration, int(self._total_iterations) + 1)
+        if self._replay is not None:
+            iterations, self._day_profile = self._get_replay_profile(
+                first_iteration)
+        elif self._meter_count <= 1:
+            self._day_profile = self._generate_day_profile()
+        self._scheduler.start_day(first_iteration)
+        for self._current_iteration in iterations:
+            self._scheduler.wait(self._current_iteration)
+            if self._meter_count > 1:
+                self._publish_fleet(channel)
+            else:
+                self._publish_meter(channel)
+        self._current_iteration = int(self._total_iterations) + 1
+        self._flush_batch(channel)
+        self._wait_confirms(channel)
+        self._publish_command(channel, "END", 0)
+
+    def _wait_confirms(self, channel):
+        """
+        Waits until broker confirms messages of pipelined publisher, so END
+        is not published before rejected readings are published again.
+        Unconfirmed readings stay buffered before END.
+        """
+        if isinstance(channel, BrokerConnection):
+            channel.wait_confirmed()
+
+    def _get_replay_profile(self, first_iteration: int
+                            ) -> Tuple[List[int], np.ndarray]:
+        """
+        Returns recorded iterations from first_iteration and day profile
+        with recorded readings at index iteration - 1.
+        """
+        iterations, readings = self._replay
+        in_day = (iterations >= first_iteration) & (
+                iterations <= self._total_iterations)
+        day_profile = np.zeros(int(self._total_iterations), dtype=np.int64)
+        day_profile[iterations[in_day] - 1] = readings[in_day]
+        return iterations[in_day].tolist(), day_profile
+
+    def get_day_readings(self, day: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns iterations and readings which a single meter publishes on
+        the day, replayed or generated (the same ones for a seeded day).
+        """
+        self._rng = self._make_rng(day)
+        if self._replay is not None:
+            iterations, day_profile = self._get_replay_profile(1)
+            iterations = np.asarray(iterations, dtype=np.int64)
+        else:
+            day_profile = self._generate_day_profile()
+            iterations = np.arange(1, len(day_profile) + 1)
+        return iterations, day_profile[iterations - 1]
 
     def _generate_meter(self, current_iteration: int) -> int:
         """
@@ -114,6 +291,51 @@ class Meter:
             meter_value = self._pv_max
         return meter_value
 
+    def _make_rng(self, day: int) -> np.random.Generator:
+        """
+        Returns random generator of the day, seeded with (seed, day) when
+        seed is given.
+        """
+        if self._seed is None:
+            return np.random.default_rng()
+        return np.random.default_rng([self._seed, day])
+
+    def _generate_day_profile(self) -> np.ndarray:
+        """
+        Generates values between pv_min and pv_max (Watt) of all iterations
+        of the day at once, value of iteration i is at index i - 1.
+        """
+        iterations = np.arange(1, int(self._total_iterations) + 1)
+        time = self._get_fraction_time(0, 0, iterations * self._time_iter)
+        max_consume = self._get_fraction_time(self._rng.integers(
+            self._max_consume - 2, self._max_consume + 2, len(iterations),
+            endpoint=True))
+        morning_a = self._pv_max * 0.75 / max_consume
+        evening_a = (-self._pv_max * 0.75) / (1 - max_consume)
+        meter_values = np.where(iterations <= self._max_consume * 60,
+                                morning_a * time,
+                                evening_a * time + evening_a * -1)
+        return np.clip(np.trunc(meter_values), self._pv_min,
+                       self._pv_max).astype(np.int64)
+
+    def _generate_fleet_meter(self, current_iteration: int) -> np.ndarray:
+        """
+        Generates values between pv_min and pv_max (Watt) of all meters
+        of the fleet at once.
+        """
+        time = self._get_fraction_time(0, 0,
+                                       current_iteration * self._time_iter)
+        max_consume = self._get_fraction_time(self._rng.integers(
+            self._max_consume - 2, self._max_consume + 2, self._meter_count,
+            endpoint=True))
+        if current_iteration <= self._max_consume * 60:
+            meter_values = (self._pv_max * 0.75 / max_consume) * time
+        else:
+            A = (-self._pv_max * 0.75) / (1 - max_consume)
+            meter_values = A * time + A * -1
+        return np.clip(np.trunc(meter_values), self._pv_min,
+                       self._pv_max).astype(FLEET_READING)
+
     def _morning_strgt_meter(self, x: float) -> float:
         A = self._pv_max * 0.75 / (self._get_fraction_time(
             randint(self._max_consume - 2,
@@ -138,19 +360,140 @@ class Meter:
                f"{self._current_iteration}{self._delimiter}" \
                f"{meter}"
 
-    def _publish_meter_to_broker(self, channel, data_to_send: str):
+    def _publish_meter(self, channel):
+        """
+        Generates reading of current iteration and publishes it as DATA
+        message or adds it to batch.
+        """
+        meter = int(self._day_profile[self._current_iteration - 1])
+        if self._batch_size > 1:
+            self._add_to_batch(channel, meter)
+        else:
+            self._publish_command(channel, "DATA", meter)
+
+    def _publish_command(self, channel, command: str, value: int):
+        """
+        Publishes START (value is timestamp), DATA or END message of current
+        iteration in message encoding of the meter.
+        """
+        if self._message_encoding == "binary":
+            if command == "START":
+                data_to_send = encode_reading(command, self._current_day,
+                                              value, 0)
+            else:
+                data_to_send = encode_reading(command, self._current_day,
+                                              self._current_iteration, value)
+            self._publish_meter_to_broker(channel, data_to_send,
+                                          get_content_type())
+        elif command == "START":
+            self._publish_meter_to_broker(
+                channel, f"START::{self._current_day}{self._delimiter}{value}")
+        else:
+            self._publish_meter_to_broker(
+                channel, f"{command}::{self._make_string_to_broker(value)}")
+
+    def _add_to_batch(self, channel, meter: int):
+        """
+        Adds reading of current iteration to batch and publishes batch
+        when it is full or flush interval is over.
+        """
+        self._batch.append((self._current_iteration, meter))
+        if len(self._batch) >= self._batch_size or \
+                time.monotonic() - self._batch_flushed_at >= \
+                self._batch_flush_interval:
+            self._flush_batch(channel)
+
+    def _flush_batch(self, channel):
+        """
+        Publishes collected readings as one BATCH message.
+        """
+        self._batch_flushed_at = time.monotonic()
+        if not self._batch:
+            return
+        data_to_send = self._make_batch_to_broker(self._batch)
+        self._batch = []
+        self._publish_meter_to_broker(channel, data_to_send)
+
+    def _make_batch_to_broker(self, readings: List[Tuple[int, int]]) -> bytes:
+        """
+        Packs readings of current day to binary BATCH message:
+        command, day and count header, then (iteration, value) pairs.
+        """
+        frame = bytearray(BATCH_COMMAND)
+        frame += BATCH_HEADER.pack(self._current_day, len(readings))
+        for iteration, meter in readings:
+            frame += BATCH_READING.pack(iteration, meter)
+        return bytes(frame)
+
+    def _get_queues(self) -> List[Tuple[str, dict]]:
+        """
+        Returns queues and their arguments meter publishes to.
+        """
+        if self._shard_count > 1:
+            return [(self._get_shard_queue(shard),
+                     {"x-single-active-consumer": True})
+                    for shard in range(self._shard_count)]
+        return [(self._broker_queue, None)]
+
+    def _get_shard_queue(self, shard: int) -> str:
+        """
+        Returns name of queue of the shard.
+        """
+        return f"{self._broker_queue}.{shard}"
+
+    def _get_routing_key(self) -> str:
+        """
+        Returns queue for messages of current day.
+        """
+        if self._shard_count > 1:
+            return self._get_shard_queue(self._current_day % self._shard_count)
+        return self._broker_queue
+
+    def _publish_fleet(self, channel):
+        """
+        Generates readings of all meters for current iteration and publishes
+        them as one FLEET message. Every publish is confirmed, so all
+        readings are in queue before END of the day is published.
+        """
+        meter_values = self._generate_fleet_meter(self._current_iteration)
+        self._publish_meter_to_broker(
+            channel, self._make_fleet_to_broker(0, meter_values))
+
+    def _make_fleet_to_broker(self, first_meter: int,
+                              meter_values: np.ndarray) -> bytes:
+        """
+        Packs readings of meters first_meter, first_meter + 1, ... of current
+        iteration to binary FLEET message: command, day, iteration,
+        first meter ID and count header, then int32 values.
+        """
+        return FLEET_COMMAND + FLEET_HEADER.pack(
+            self._current_day, self._current_iteration, first_meter,
+            len(meter_values)) + meter_values.astype(FLEET_READING).tobytes()
+
+    def _publish_meter_to_broker(self, channel, data_to_send: str,
+                                 content_type: str = None):
         """
         Publishes simulated value to broker.
         """
         logging.info("Meter: Publishing meter to broker: %s", data_to_send)
         try:
-            channel.basic_publish(exchange='', routing_key=self._broker_queue,
-                                  body=data_to_send,
-                                  properties=pika.BasicProperties(
-                                      delivery_mode=2))
+            with PUBLISH_SECONDS.time():
+                channel.basic_publish(exchange='',
+                                      routing_key=self._get_routing_key(),
+                                      body=data_to_send,
+                                      properties=pika.BasicProperties(
+                                          delivery_mode=2,
+                                          content_type=content_type, headers={
+                                              "published_at": time.time()}))
+            PUBLISHED.inc()
         except pika.exceptions.ConnectionClosedByBroker as e:
+            PUBLISH_ERRORS.inc()
             logging.error("Meter: Connection to broker closed by broker: %s", e)
         except pika.exceptions.AMQPConnectionError as e:
+            PUBLISH_ERRORS.inc()
             logging.error("Meter: Connection to broker failed: %s", e)
         except Exception as e:
+            PUBLISH_ERRORS.inc()
             logging.error("Meter: Error while publishing PV: %s", e)
+        if isinstance(channel, PipelinedBrokerConnection):
+            UNCONFIRMED.set(channel.unconfirmed())
@@ -0,0 +1,51 @@
+from typing import NamedTuple, Optional
+
+from common.Config import read_environment
+
+
+class MeterConfig(NamedTuple):
+    """
+    Immutable configuration of meter simulator with defaults of its
+    environment variables. Fields are keyword arguments of Meter.
+    """
+    broker_host: str = "rabbitmq"
+    broker_port: str = "5672"
+    broker_queue: str = "meter_simulator"
+    broker_username: str = "guest"
+    broker_password: str = "guest"
+    pv_min: int = 0
+    pv_max: int = 9000
+    time_iter: int = 60
+    logfile: str = "./log/meter.log"
+    environment_pv: str = "DEV"
+    delimiter: str = ";"
+    max_consume: int = 14
+    batch_size: int = 1
+    batch_flush_interval: float = 1.0
+    shard_count: int = 1
+    meter_count: int = 1
+    seed: Optional[int] = None
+    log_sample_rate: int = 1
+    log_rate_limit: int = 0
+    log_format: str = "text"
+    publish_window: int = 1
+    metrics_port: int = 0
+    metrics_file: str = ""
+    metrics_interval: float = 10.0
+    resume_day: int = 0
+    resume_iteration: int = 1
+    message_encoding: str = "text"
+    speedup: float = 0
+    replay_file: str = ""
+    broker_reconnect_delay: float = 1.0
+    broker_reconnect_max_delay: float = 30.0
+    broker_buffer_size: int = 10000
+    broker_spill_dir: str = ""
+
+    @classmethod
+    def from_env(cls, environ=None) -> "MeterConfig":
+        """
+        Reads consumer's meter parameters from environment.
+        :return:
+        """
+        return read_environment(cls, environ=environ)
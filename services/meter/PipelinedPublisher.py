@@ -0,0 +1,246 @@
+import logging
+import threading
+from functools import partial
+from typing import Callable, List, Tuple
+
+import pika
+from pika.spec import Basic
+
+from common.Broker import BrokerConnection
+
+
+class PipelinedPublisher:
+    """
+    Publisher keeping up to window unconfirmed messages in flight.
+    Runs pika SelectConnection in a background thread, tracks delivery tags
+    of published messages and publishes nacked messages again, together
+    with later unconfirmed ones. Broker may have queued some later messages
+    already, so a message published again can come after them, PV
+    simulator writes readings of earlier iterations too.
+    basic_publish() has the same arguments as channel's one and blocks only
+    when window is full, so it can be used instead of a channel.
+    """
+
+    def __init__(self, parameters: pika.ConnectionParameters,
+                 queues: List[Tuple[str, dict]], window: int,
+                 timeout: float = 30.0):
+        self._parameters = parameters
+        self._queues = queues
+        self._window = window
+        self._timeout = timeout
+        self._condition = threading.Condition()
+        self._unconfirmed = {}
+        self._delivery_tag = 0
+        self._error = None
+        self._closing = False
+        self._ready = threading.Event()
+        self._connection = None
+        self._channel = None
+        self._thread = None
+
+    def connect(self):
+        """
+        Opens connection and channel with publisher confirms, declares
+        queues. Waits until the channel is ready.
+        """
+        self._connection = pika.SelectConnection(
+            self._parameters, on_open_callback=self._on_connection_open,
+            on_open_error_callback=self._on_connection_closed,
+            on_close_callback=self._on_connection_closed)
+        self._thread = threading.Thread(target=self._connection.ioloop.start,
+                                        name="PipelinedPublisher",
+                                        daemon=True)
+        self._thread.start()
+        if not self._ready.wait(self._timeout):
+            raise pika.exceptions.AMQPConnectionError(
+                "Publisher channel is not ready")
+        if self._error is not None:
+            raise self._error
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_closed(self, connection, error):
+        with self._condition:
+            if not self._closing:
+                if not isinstance(error, Exception):
+                    error = pika.exceptions.AMQPConnectionError(error)
+                logging.error("Meter: Publisher connection closed: %s", error)
+                self._error = error
+            self._condition.notify_all()
+        self._ready.set()
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        self._declare_queues(list(self._queues))
+
+    def _declare_queues(self, queues: List[Tuple[str, dict]], frame=None):
+        if queues:
+            queue, arguments = queues.pop(0)
+            self._channel.queue_declare(
+                queue=queue, durable=True, arguments=arguments,
+                callback=partial(self._declare_queues, queues))
+        else:
+            self._channel.confirm_delivery(
+                ack_nack_callback=self._on_confirm,
+                callback=lambda frame: self._ready.set())
+
+    def basic_publish(self, exchange: str, routing_key: str, body,
+                      properties: pika.BasicProperties = None):
+        """
+        Publishes message, waits while window of unconfirmed messages
+        is full.
+        """
+        with self._condition:
+            while len(self._unconfirmed) >= self._window and \
+                    self._error is None:
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            self._schedule_publish((exchange, routing_key, body, properties))
+
+    def _schedule_publish(self, message: tuple):
+        """
+        Assigns delivery tag to message and publishes it from ioloop thread.
+        Must be called with condition locked, so delivery tags are assigned
+        in the same order as messages are published.
+        """
+        self._delivery_tag += 1
+        self._unconfirmed[self._delivery_tag] = message
+        exchange, routing_key, body, properties = message
+        self._connection.ioloop.add_callback_threadsafe(partial(
+            self._channel.basic_publish, exchange, routing_key, body,
+            properties))
+
+    def _on_confirm(self, frame: pika.frame.Method):
+        """
+        Removes confirmed messages. When broker rejects messages, they and
+        all later unconfirmed messages are published again in order of
+        publishing.
+        """
+        method = frame.method
+        with self._condition:
+            if method.multiple:
+                delivery_tags = [delivery_tag for delivery_tag in
+                                 self._unconfirmed
+                                 if delivery_tag <= method.delivery_tag]
+            else:
+                delivery_tags = [method.delivery_tag]
+            delivery_tags = [delivery_tag for delivery_tag in delivery_tags
+                             if delivery_tag in self._unconfirmed]
+            if isinstance(method, Basic.Nack) and delivery_tags:
+                first_tag = min(delivery_tags)
+                messages = [self._unconfirmed.pop(delivery_tag)
+                            for delivery_tag in sorted(self._unconfirmed)
+                            if delivery_tag >= first_tag]
+                logging.error("Meter: Broker rejected %d messages, "
+                              "publishing them and %d later messages again",
+                              len(delivery_tags),
+                              len(messages) - len(delivery_tags))
+                for message in messages:
+                    self._schedule_publish(message)
+            else:
+                for delivery_tag in delivery_tags:
+                    del self._unconfirmed[delivery_tag]
+            self._condition.notify_all()
+
+    @property
+    def is_open(self) -> bool:
+        return self._error is None and self._connection is not None and \
+            self._connection.is_open
+
+    def unconfirmed(self) -> int:
+        """
+        Returns quantity of messages waiting for confirm.
+        """
+        with self._condition:
+            return len(self._unconfirmed)
+
+    def take_unconfirmed(self) -> List[tuple]:
+        """
+        Removes and returns messages waiting for confirm in order of
+        publishing, e.g. to publish them over a new connection.
+        """
+        with self._condition:
+            messages = [self._unconfirmed[delivery_tag]
+                        for delivery_tag in sorted(self._unconfirmed)]
+            self._unconfirmed.clear()
+            self._condition.notify_all()
+            return messages
+
+    def flush(self):
+        """
+        Waits until all published messages are confirmed.
+        """
+        with self._condition:
+            while self._unconfirmed and self._error is None:
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+
+    def close(self):
+        """
+        Waits for confirms of published messages and closes connection.
+        """
+        try:
+            if self._error is None:
+                self.flush()
+        finally:
+            self._closing = True
+            if self._connection is not None and self._error is None:
+                self._connection.ioloop.add_callback_threadsafe(
+                    self._connection.close)
+            if self._thread is not None:
+                self._thread.join(self._timeout)
+
+
+class PipelinedBrokerConnection(BrokerConnection):
+    """
+    BrokerConnection publishing through PipelinedPublisher with up to
+    window unconfirmed messages, so it reconnects with backoff and buffers
+    messages while broker is unavailable. Messages unconfirmed when the
+    connection is lost are buffered again before the buffered ones and
+    published again in order after reconnect.
+    """
+
+    def __init__(self, *args, window: int,
+                 publisher_factory: Callable = PipelinedPublisher, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._window = window
+        self._publisher_factory = publisher_factory
+
+    def _open_channel(self) -> tuple:
+        publisher = self._publisher_factory(self._parameters, self._queues,
+                                            self._window)
+        publisher.connect()
+        return publisher, publisher
+
+    def _reset(self):
+        if self.connection is not None:
+            self._buffer.prepend(self.connection.take_unconfirmed())
+        super()._reset()
+
+    def unconfirmed(self) -> int:
+        """
+        Returns quantity of messages waiting for confirm.
+        """
+        return self.connection.unconfirmed() if self.is_open else 0
+
+    def wait_confirmed(self) -> bool:
+        if not self.flush():
+            return False
+        try:
+            self.connection.flush()
+        except pika.exceptions.AMQPError as e:
+            logging.error("%s: Messages are not confirmed: %s", self._name, e)
+            self._reset()
+            return False
+        return True
+
+    def close(self):
+        """
+        Waits for confirms of published messages and closes connection.
+        """
+        self.wait_confirmed()
+        super().close()
@@ -0,0 +1,66 @@
+import time
+from typing import Callable, Tuple
+
+import numpy as np
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+class Scheduler:
+    """
+    Paces iterations at speedup times real time: iteration i of a day is
+    due (i - first_iteration) * time_iter / speedup seconds after the day
+    started, and the next day starts right after the last iteration.
+    Deadlines are computed from monotonic clock, so a late iteration is
+    published at once and the schedule doesn't drift. Speedup 0 doesn't
+    wait at all.
+    """
+
+    def __init__(self, time_iter: int, speedup: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self._iterations = SECONDS_PER_DAY // time_iter
+        self._interval = time_iter / speedup if speedup > 0 else 0
+        self._clock = clock
+        self._sleep = sleep
+        self._first_iteration = 1
+        self._day_started = None
+        self._next_day = None
+
+    def start_day(self, first_iteration: int = 1):
+        """
+        Starts schedule of a day from first_iteration.
+        """
+        now = self._clock()
+        if self._next_day is not None and self._next_day > now:
+            now = self._next_day
+        self._day_started = now
+        self._first_iteration = first_iteration
+        self._next_day = now + (self._iterations + 1 - first_iteration) * \
+            self._interval
+
+    def wait(self, iteration: int):
+        """
+        Waits until iteration of the day is due.
+        """
+        if not self._interval:
+            return
+        delay = self._day_started + (iteration - self._first_iteration) * \
+            self._interval - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+
+def read_day_file(filename: str, delimiter: str = ";"
+                  ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reads recorded day file of PV simulator (.csv or .npy with timestamp,
+    meter, pv and sum columns). Returns iterations and meter's readings,
+    which are stored negative in the file.
+    """
+    if filename.endswith(".npy"):
+        data_day = np.load(filename)
+    else:
+        data_day = np.loadtxt(filename, dtype=np.int64, delimiter=delimiter,
+                              skiprows=1, ndmin=2)
+    return data_day[:, 0].astype(np.int64), -data_day[:, 1].astype(np.int64)
@@ -1,6 +1,11 @@
+import numpy as np
 import pika
+from common.Protocol import decode_reading, is_binary
 from meter.Meter import Meter
+from common.Broker import BrokerConnection
+from meter.Scheduler import Scheduler
 import unittest
+from unittest import mock
 import logging
 
 
@@ -19,6 +24,23 @@ class testMeter(unittest.TestCase, Meter):
     _time_iter = 60
     _logfile = "./log/tests.log"
     _max_consume = 14
+    _batch_size = 3
+    _batch_flush_interval = 1.0
+    _shard_count = 1
+    _current_day = 0
+    _meter_count = 100
+    _rng = np.random.default_rng()
+    _seed = 42
+    _publish_window = 1
+    _message_encoding = "text"
+    _replay = None
+    _broker = None
+    _broker_reconnect_delay = 1.0
+    _broker_reconnect_max_delay = 30.0
+    _broker_buffer_size = 100
+    _broker_spill_dir = None
+    _scheduler = Scheduler(60, 0)
+    _total_iterations = 24 * 60 * 60 / _time_iter
 
     _credentials = pika.PlainCredentials(_broker_username, _broker_password)
 
@@ -62,6 +84,104 @@ class testMeter(unittest.TestCase, Meter):
     def test_evening_strgt_meter(self):
         assert self._evening_strgt_meter(1) == 0
 
+    def test_make_batch_to_broker(self):
+        self._current_day = 1
+        batch = self._make_batch_to_broker([(1, 1234), (2, 4321)])
+        assert batch.startswith(b"BATCH::")
+        assert len(batch) == len(b"BATCH::") + 8 + 2 * 8
+
+    def test_get_routing_key(self):
+        assert self._get_routing_key() == "meter_simulator_test"
+        self._shard_count = 3
+        self._current_day = 4
+        assert self._get_routing_key() == "meter_simulator_test.1"
+
+    def test_generate_day_profile(self):
+        self._rng = self._make_rng(1)
+        day_profile = self._generate_day_profile()
+        assert day_profile.shape == (1440,)
+        assert day_profile.min() >= self._pv_min
+        assert day_profile.max() <= self._pv_max
+        self._rng = self._make_rng(1)
+        assert (self._generate_day_profile() == day_profile).all()
+        self._rng = self._make_rng(2)
+        assert (self._generate_day_profile() != day_profile).any()
+
+    def test_day_profile_equals_scalar(self):
+        self._rng = self._make_rng(1)
+        day_profile = self._generate_day_profile()
+        self._rng = self._make_rng(1)
+        consume = self._rng.integers(self._max_consume - 2,
+                                     self._max_consume + 2, 1440,
+                                     endpoint=True)
+        for iteration in (1, 600, 840, 841, 1200, 1440):
+            with mock.patch("meter.Meter.randint",
+                            return_value=consume[iteration - 1]):
+                assert self._generate_meter(iteration) == \
+                       day_profile[iteration - 1]
+
+    def test_generate_fleet_meter(self):
+        meter_values = self._generate_fleet_meter(600)
+        assert meter_values.shape == (100,)
+        assert meter_values.min() >= self._pv_min
+        assert meter_values.max() <= self._pv_max
+
+    def test_make_fleet_to_broker(self):
+        self._current_iteration = 2
+        fleet = self._make_fleet_to_broker(10, np.array([1234, 4321]))
+        assert fleet.startswith(b"FLEET::")
+        assert len(fleet) == len(b"FLEET::") + 16 + 2 * 4
+
+    def test_resume_day(self):
+        channel = mock.Mock()
+        self._meter_count = 1
+        self._batch_size = 1
+        self._delimiter = ";"
+        self._batch = []
+        self._run_day(channel, 1439)
+        bodies = [call.kwargs["body"]
+                  for call in channel.basic_publish.call_args_list]
+        assert bodies[0].startswith("START::0;")
+        assert [body.split(";")[1] for body in bodies[1:]] == [
+            "1439", "1440", "1441"]
+        assert bodies[-1].startswith("END::")
+        self._rng = self._make_rng(0)
+        day_profile = self._generate_day_profile()
+        assert bodies[1] == f"DATA::0;1439;{day_profile[1438]}"
+
+    def test_replay(self):
+        channel = mock.Mock()
+        self._meter_count = 1
+        self._batch_size = 1
+        self._delimiter = ";"
+        self._batch = []
+        self._replay = (np.array([1, 2, 5]), np.array([100, 200, 500]))
+        self._run_day(channel, 2)
+        bodies = [call.kwargs["body"]
+                  for call in channel.basic_publish.call_args_list]
+        assert bodies[1:-1] == ["DATA::0;2;200", "DATA::0;5;500"]
+
+    def test_wait_confirms_before_end(self):
+        channel = mock.Mock(spec=BrokerConnection)
+        self._meter_count = 1
+        self._batch_size = 1
+        self._delimiter = ";"
+        self._batch = []
+        self._run_day(channel, 1440)
+        calls = [name for name, args, kwargs in channel.mock_calls]
+        assert calls[-2:] == ["wait_confirmed", "basic_publish"]
+        assert channel.basic_publish.call_args.kwargs["body"].startswith(
+            "END::")
+
+    def test_publish_binary(self):
+        channel = mock.Mock()
+        self._message_encoding = "binary"
+        self._current_iteration = 5
+        self._publish_command(channel, "DATA", 1234)
+        call = channel.basic_publish.call_args
+        assert decode_reading(call.kwargs["body"]) == ("DATA", 0, 5, 1234)
+        assert is_binary(call.kwargs["properties"].content_type)
+
     def test_get_fraction_time(self):
         assert self._get_fraction_time(0) == 0
         assert self._get_fraction_time(24) == 1
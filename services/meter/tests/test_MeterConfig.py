@@ -0,0 +1,22 @@
+import inspect
+import unittest
+
+from meter.Meter import Meter
+from meter.MeterConfig import MeterConfig
+
+
+class testMeterConfig(unittest.TestCase):
+    """
+    Class for testing config of meter simulator.
+    """
+
+    def test_fields(self):
+        parameters = inspect.signature(Meter).parameters
+        assert list(MeterConfig._fields) == list(parameters)
+
+    def test_from_env(self):
+        config = MeterConfig.from_env({"SEED": "7", "SPEEDUP": "60"})
+        assert config.seed == 7
+        assert config.speedup == 60.0
+        assert MeterConfig.from_env({"SEED": ""}).seed is None
+        assert config.logfile == "./log/meter.log"
@@ -0,0 +1,159 @@
+import threading
+import time
+import unittest
+
+import pika
+from pika.frame import Method
+from pika.spec import Basic
+
+from meter.PipelinedPublisher import (PipelinedBrokerConnection,
+                                       PipelinedPublisher)
+
+
+class FakeIOLoop:
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+
+class FakeConnection:
+    ioloop = FakeIOLoop()
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append(body)
+
+
+class testPipelinedPublisher(unittest.TestCase):
+    """
+    Class for testing pipelined publisher confirms.
+    """
+
+    def setUp(self):
+        self.publisher = PipelinedPublisher(pika.ConnectionParameters(),
+                                            [("meter_simulator_test", None)],
+                                            3)
+        self.publisher._connection = FakeConnection()
+        self.channel = FakeChannel()
+        self.publisher._channel = self.channel
+
+    def publish(self, body: bytes):
+        self.publisher.basic_publish("", "meter_simulator_test", body)
+
+    def test_ack_multiple(self):
+        for body in (b"1", b"2", b"3"):
+            self.publish(body)
+        assert self.publisher.unconfirmed() == 3
+        self.publisher._on_confirm(Method(1, Basic.Ack(2, multiple=True)))
+        assert self.publisher.unconfirmed() == 1
+        self.publisher._on_confirm(Method(1, Basic.Ack(3)))
+        self.publisher.flush()
+
+    def test_nack_publishes_again(self):
+        for body in (b"1", b"2", b"3"):
+            self.publish(body)
+        self.publisher._on_confirm(Method(1, Basic.Ack(1)))
+        self.publisher._on_confirm(Method(1, Basic.Nack(2)))
+        assert self.channel.published == [b"1", b"2", b"3", b"2", b"3"]
+        assert self.publisher.unconfirmed() == 2
+        self.publisher._on_confirm(Method(1, Basic.Ack(3)))
+        self.publisher._on_confirm(Method(1, Basic.Nack(3)))
+        assert self.publisher.unconfirmed() == 2
+        self.publisher._on_confirm(Method(1, Basic.Ack(5, multiple=True)))
+        assert self.publisher.unconfirmed() == 0
+
+    def test_take_unconfirmed(self):
+        for body in (b"1", b"2", b"3"):
+            self.publish(body)
+        self.publisher._on_confirm(Method(1, Basic.Ack(2)))
+        assert [message[2] for message in
+                self.publisher.take_unconfirmed()] == [b"1", b"3"]
+        assert self.publisher.unconfirmed() == 0
+
+    def test_full_window_blocks(self):
+        for body in (b"1", b"2", b"3"):
+            self.publish(body)
+        publishing = threading.Thread(target=self.publish, args=(b"4",))
+        publishing.start()
+        time.sleep(0.1)
+        assert self.channel.published == [b"1", b"2", b"3"]
+        self.publisher._on_confirm(Method(1, Basic.Ack(1)))
+        publishing.join(1)
+        assert self.channel.published == [b"1", b"2", b"3", b"4"]
+
+
+class FakePublisher:
+    """
+    Publisher whose connection is lost when lost is set, messages stay
+    unconfirmed until confirm().
+    """
+
+    def __init__(self, parameters, queues, window: int):
+        self.published = []
+        self.lost = False
+        self._unconfirmed = []
+
+    def connect(self):
+        pass
+
+    @property
+    def is_open(self) -> bool:
+        return not self.lost
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        if self.lost:
+            raise pika.exceptions.StreamLostError("Connection lost")
+        self.published.append(body)
+        self._unconfirmed.append((exchange, routing_key, body, properties))
+
+    def confirm(self):
+        self._unconfirmed = []
+
+    def unconfirmed(self) -> int:
+        return len(self._unconfirmed)
+
+    def take_unconfirmed(self) -> list:
+        messages, self._unconfirmed = self._unconfirmed, []
+        return messages
+
+    def flush(self):
+        self.confirm()
+
+    def close(self):
+        pass
+
+
+class testPipelinedBrokerConnection(unittest.TestCase):
+    """
+    Class for testing reconnecting pipelined publisher.
+    """
+
+    def test_publish_again_after_reconnect(self):
+        publishers = []
+
+        def make_publisher(*args):
+            publishers.append(FakePublisher(*args))
+            return publishers[-1]
+
+        connection = PipelinedBrokerConnection(
+            None, [("queue", None)], "Test", window=3,
+            publisher_factory=make_publisher, sleep=lambda delay: None)
+        connection.connect()
+        for body in (b"1", b"2"):
+            connection.basic_publish("", "queue", body)
+        publishers[0].confirm()
+        connection.basic_publish("", "queue", b"3")
+        assert connection.unconfirmed() == 1
+        publishers[0].lost = True
+        connection.basic_publish("", "queue", b"4")
+        assert len(publishers) == 2
+        assert publishers[1].published == [b"3", b"4"]
+        assert connection.wait_confirmed()
+        assert connection.unconfirmed() == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from meter.Scheduler import Scheduler, read_day_file
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class testScheduler(unittest.TestCase):
+    """
+    Class for testing pacing of meter's iterations.
+    """
+
+    def test_pacing(self):
+        fake = FakeClock()
+        scheduler = Scheduler(60, 60, fake.clock, fake.sleep)
+        scheduler.start_day()
+        for iteration in range(1, 4):
+            scheduler.wait(iteration)
+        assert fake.sleeps == [1, 1]
+
+    def test_late_iteration(self):
+        fake = FakeClock()
+        scheduler = Scheduler(60, 60, fake.clock, fake.sleep)
+        scheduler.start_day()
+        fake.now += 2.5
+        scheduler.wait(2)
+        scheduler.wait(3)
+        scheduler.wait(4)
+        assert fake.sleeps == [0.5]
+        assert fake.now == 103
+
+    def test_next_day(self):
+        fake = FakeClock()
+        scheduler = Scheduler(21600, 21600, fake.clock, fake.sleep)
+        scheduler.start_day(3)
+        scheduler.wait(4)
+        scheduler.start_day()
+        scheduler.wait(1)
+        assert fake.now == 102
+
+    def test_max_speed(self):
+        fake = FakeClock()
+        scheduler = Scheduler(60, 0, fake.clock, fake.sleep)
+        scheduler.start_day()
+        scheduler.wait(1440)
+        assert fake.sleeps == []
+
+    def test_read_day_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "output_day1.csv")
+            with open(filename, "w") as data_file:
+                data_file.write("timestamp;meter;pv;sum\n"
+                                "1;-100;0;-100\n2;-200;50;-150\n")
+            iterations, readings = read_day_file(filename)
+            assert iterations.tolist() == [1, 2]
+            assert readings.tolist() == [100, 200]
+            filename = os.path.join(directory, "output_day1.npy")
+            np.save(filename, np.array([[3, -300, 0, -300]], dtype="<i4"))
+            iterations, readings = read_day_file(filename)
+            assert (iterations.tolist(), readings.tolist()) == ([3], [300])
+
+
+if __name__ == "__main__":
+    unittest.main()
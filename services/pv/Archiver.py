@@ -0,0 +1,235 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class ArchiveIndex:
+    """
+    Index of archived days: "<prefix>_archive_index.json" maps every day to
+    its monthly archive and offsets of its files in the archive. Changes
+    are made under a file lock, so PV simulators of several shards can
+    share the same directory.
+    """
+
+    def __init__(self, prefix: str):
+        self.filename = f"{prefix}_archive_index.json"
+        self.days = {}
+
+    def load(self) -> "ArchiveIndex":
+        try:
+            with open(self.filename) as index_file:
+                self.days = json.load(index_file)
+        except FileNotFoundError:
+            self.days = {}
+        return self
+
+    def save(self):
+        with open(self.filename + ".tmp", "w") as index_file:
+            json.dump(self.days, index_file, sort_keys=True)
+        os.replace(self.filename + ".tmp", self.filename)
+
+    @contextmanager
+    def locked(self):
+        """
+        Loads index under exclusive lock and saves it on exit.
+        """
+        with open(self.filename + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.load()
+            yield self
+            self.save()
+
+
+class DayArchiver:
+    """
+    Rolls finished day files into compressed archives
+    "<prefix>_month<N>.zip" of days_per_archive days, in a background
+    thread. A day is archived when the day archive_after_days later is
+    finished, so recent days stay plain files. Only days of owns_day are
+    archived, e.g. days of shards of the PV simulator, other shards
+    archive their days themselves. Archiving waits for the future of the
+    day returned by get_pending, e.g. its plot rendered in background.
+    Files of a day are named by get_filenames(day), missing ones are
+    skipped. The first finished day checks all older days, so days
+    finished before a restart are archived too. Files of a day simulated
+    again replace its archived files. Files are compressed in chunks, so
+    memory doesn't grow with size of a day.
+    With retention_days only archives with days newer than the last
+    archived day - retention_days are kept.
+    """
+
+    def __init__(self, prefix: str, get_filenames: Callable[[int], List[str]],
+                 archive_after_days: int, days_per_archive: int = 30,
+                 retention_days: int = 0,
+                 owns_day: Callable[[int], bool] = None,
+                 get_pending: Callable[[int], Optional[Future]] = None):
+        self._prefix = prefix
+        self._get_filenames = get_filenames
+        self._archive_after_days = archive_after_days
+        self._days_per_archive = days_per_archive
+        self._retention_days = retention_days
+        self._owns_day = owns_day or (lambda meter_day: True)
+        self._get_pending = get_pending or (lambda meter_day: None)
+        self._last_day = -1
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def day_finished(self, meter_day: int):
+        """
+        Archives own days which are archive_after_days or more older than
+        finished day and were not archived yet.
+        """
+        last_day = meter_day - self._archive_after_days
+        for day in range(self._last_day + 1, last_day + 1):
+            if self._owns_day(day):
+                self.submit(day, self._get_filenames(day),
+                            self._get_pending(day))
+        self._last_day = max(self._last_day, last_day)
+
+    def submit(self, meter_day: int, filenames: List[str],
+               pending: Future = None) -> Future:
+        """
+        Queues archiving of files of the day after pending future is done.
+        """
+        future = self._executor.submit(self.archive_day, meter_day, filenames,
+                                       pending)
+        future.add_done_callback(self._done)
+        return future
+
+    @staticmethod
+    def _done(future: Future):
+        error = future.exception()
+        if error is not None:
+            logging.error(f"PV: Can't archive day! Error: {error}")
+
+    def get_archive_filename(self, meter_day: int) -> str:
+        return f"{self._prefix}_month{meter_day // self._days_per_archive}.zip"
+
+    def archive_day(self, meter_day: int, filenames: List[str],
+                    pending: Future = None):
+        """
+        Waits for pending future, adds existing files of the day to its
+        archive, records them in the index, removes them and applies
+        retention.
+        """
+        if pending is not None:
+            wait([pending])
+        filenames = [filename for filename in filenames
+                     if os.path.isfile(filename)]
+        if not filenames:
+            return
+        archive_filename = self.get_archive_filename(meter_day)
+        archive_name = os.path.basename(archive_filename)
+        names = [os.path.basename(filename) for filename in filenames]
+        with ArchiveIndex(self._prefix).locked() as index:
+            if os.path.isfile(archive_filename):
+                with zipfile.ZipFile(archive_filename) as archive:
+                    archived = set(names) & set(archive.namelist())
+                if archived:
+                    logging.warning(f"PV: Replacing archived files of day "
+                                    f"{meter_day} in {archive_filename}")
+                    self._remove_members(archive_filename, archived)
+            with zipfile.ZipFile(archive_filename, "a",
+                                 zipfile.ZIP_DEFLATED) as archive:
+                for filename, name in zip(filenames, names):
+                    archive.write(filename, name)
+                entry = index.days.setdefault(
+                    str(meter_day), {"archive": archive_name, "members": {}})
+                entry["members"].update(dict.fromkeys(names))
+                for entry in index.days.values():
+                    if entry["archive"] == archive_name:
+                        entry["members"] = {
+                            name: archive.getinfo(name).header_offset
+                            for name in entry["members"]}
+            for filename in filenames:
+                os.remove(filename)
+            logging.info(f"PV: Archived day {meter_day} to {archive_filename}")
+            if self._retention_days:
+                self._apply_retention(index, meter_day - self._retention_days)
+
+    @staticmethod
+    def _remove_members(archive_filename: str, names: set):
+        """
+        Rewrites archive without members of names, other members are
+        copied in chunks.
+        """
+        with zipfile.ZipFile(archive_filename) as archive, \
+                zipfile.ZipFile(archive_filename + ".tmp", "w") as copy:
+            for info in archive.infolist():
+                if info.filename not in names:
+                    with archive.open(info) as source, \
+                            copy.open(info, "w") as target:
+                        shutil.copyfileobj(source, target)
+        os.replace(archive_filename + ".tmp", archive_filename)
+
+    def _apply_retention(self, index: ArchiveIndex, oldest_day: int):
+        """
+        Removes archives whose all days are older than oldest_day.
+        """
+        archives = {}
+        for day, entry in index.days.items():
+            archives.setdefault(entry["archive"], []).append(int(day))
+        directory = os.path.dirname(self._prefix)
+        for archive, days in archives.items():
+            if max(days) < oldest_day:
+                logging.info(f"PV: Removing archive {archive} by retention")
+                try:
+                    os.remove(os.path.join(directory, archive))
+                except FileNotFoundError:
+                    pass
+                for day in days:
+                    del index.days[str(day)]
+
+    def close(self):
+        """
+        Waits for queued archiving.
+        """
+        self._executor.shutdown(wait=True)
+
+
+class ArchiveReader:
+    """
+    Reads files of archived days. Only the requested file is decompressed,
+    it is found by the index instead of listing archives.
+    """
+
+    def __init__(self, prefix: str):
+        self._prefix = prefix
+        self._directory = os.path.dirname(prefix)
+
+    def _get_index(self) -> Dict[str, dict]:
+        return ArchiveIndex(self._prefix).load().days
+
+    def days(self) -> List[int]:
+        """
+        Returns archived days.
+        """
+        return sorted(int(day) for day in self._get_index())
+
+    def members(self, meter_day: int) -> List[str]:
+        """
+        Returns names of archived files of the day.
+        """
+        entry = self._get_index().get(str(meter_day))
+        return sorted(entry["members"]) if entry else []
+
+    def read(self, meter_day: int, name: str, start: int = 0,
+             end: int = None) -> bytes:
+        """
+        Returns bytes start:end of archived file of the day. Compressed
+        member can't be seeked, so bytes before start are decompressed in
+        chunks and skipped, bytes after end are not decompressed.
+        """
+        entry = self._get_index().get(str(meter_day))
+        if entry is None or name not in entry["members"]:
+            raise KeyError(f"{name} of day {meter_day} is not archived")
+        with zipfile.ZipFile(os.path.join(self._directory,
+                                          entry["archive"])) as archive:
+            with archive.open(name) as member:
+                member.seek(start)
+                return member.read(-1 if end is None else end - start)
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aio_pika
+
+from common.Metrics import REGISTRY, start_metrics
+from pv.PV import Pv
+from pv.PvConfig import PvConfig
+
+PREFETCHED = REGISTRY.gauge("pv_prefetched_messages",
+                            "Delivered messages waiting for processing")
+
+
+class AsyncPv(Pv):
+    """
+    PV simulator consuming broker with asyncio AMQP client.
+    Up to prefetch_count messages are delivered ahead, messages are
+    processed in order by a single worker thread, so file writes and plots
+    don't block the event loop. Processed messages are acknowledged
+    together with multiple=True every ack_batch_size messages or
+    ack_interval seconds, after their buffered records are written to
+    output files. A message which can't be processed is rejected.
+    """
+
+    def __init__(self, *args, ack_batch_size: int = 50,
+                 ack_interval: float = 1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ack_batch_size = ack_batch_size
+        self._ack_interval = ack_interval
+
+    @classmethod
+    def from_config(cls, config: PvConfig, **kwargs) -> "AsyncPv":
+        """
+        Makes async PV simulator of config with its ack_batch_size and
+        ack_interval.
+        """
+        kwargs.setdefault("ack_batch_size", config.ack_batch_size)
+        kwargs.setdefault("ack_interval", config.ack_interval)
+        return super().from_config(config, **kwargs)
+
+    def start(self):
+        """
+        Connects to broker and receives meter's value.
+        :return:
+        """
+        logging.info("PV: Starting async PV")
+        start_metrics(self._metrics_port, self._metrics_file,
+                      self._metrics_interval)
+        self._stop_on_sigterm()
+        try:
+            asyncio.run(self._consume())
+        except KeyboardInterrupt:
+            logging.info("PV: Stopped PV")
+        except aio_pika.exceptions.AMQPConnectionError as e:
+            logging.error("PV: Connection to broker failed: %s", e)
+        except Exception as e:
+            logging.error("PV: Error: %s", e)
+
+    async def _connect(self) -> aio_pika.abc.AbstractRobustConnection:
+        """
+        Connects to broker, retries with backoff from broker_reconnect_delay
+        up to broker_reconnect_max_delay seconds until connected. Lost
+        connection is opened again every broker_reconnect_delay seconds.
+        """
+        delay = self._broker_reconnect_delay
+        while True:
+            try:
+                return await aio_pika.connect_robust(
+                    host=self._broker_host, port=int(self._broker_port),
+                    login=self._broker_username,
+                    password=self._broker_password,
+                    reconnect_interval=self._broker_reconnect_delay)
+            except (aio_pika.exceptions.AMQPConnectionError, OSError) as e:
+                logging.error("PV: Connection to broker failed: %s, "
+                              "retrying in %.1f seconds", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._broker_reconnect_max_delay)
+
+    async def _consume(self):
+        connection = await self._connect()
+        executor = ThreadPoolExecutor(max_workers=1)
+        messages = asyncio.Queue()
+        try:
+            async with connection:
+                channel = await connection.channel()
+                channel.reopen_callbacks.add(
+                    lambda *args: self._drop_unacked(messages))
+                await channel.set_qos(prefetch_count=self._prefetch_count)
+                for queue_name in self._get_queues():
+                    queue = await channel.declare_queue(
+                        queue_name, durable=True,
+                        arguments=self._get_queue_arguments())
+                    await queue.consume(messages.put)
+                logging.info("PV: Connected to broker")
+                await self._process_messages(messages, executor)
+        finally:
+            await asyncio.get_running_loop().run_in_executor(executor,
+                                                             self._stop)
+            executor.shutdown()
+
+    def _drop_unacked(self, messages: asyncio.Queue = None):
+        """
+        Forgets unacknowledged and waiting messages of the closed channel,
+        broker delivers them again on the reopened one.
+        """
+        self._unacked = None
+        self._unacked_headers = []
+        while messages is not None and not messages.empty():
+            messages.get_nowait()
+
+    async def _process_messages(self, messages: asyncio.Queue,
+                                executor: ThreadPoolExecutor):
+        """
+        Processes received messages in order and acknowledges them in
+        batches.
+        """
+        loop = asyncio.get_running_loop()
+        self._drop_unacked()
+        acked_at = time.monotonic()
+        while True:
+            try:
+                message = await asyncio.wait_for(messages.get(),
+                                                 self._ack_interval)
+            except asyncio.TimeoutError:
+                message = None
+            PREFETCHED.set(messages.qsize())
+            if message is not None:
+                try:
+                    await loop.run_in_executor(executor, self._handle_message,
+                                               message.body,
+                                               message.content_type)
+                except Exception as e:
+                    logging.error("PV: Can't process message %s: %s",
+                                  message.body, e)
+                    await message.reject()
+                else:
+                    self._unacked = message
+                    self._unacked_headers.append(message.headers)
+            if self._unacked is not None and (
+                    len(self._unacked_headers) >= self._ack_batch_size or
+                    time.monotonic() - acked_at >= self._ack_interval):
+                await loop.run_in_executor(executor, self._flush_output)
+                unacked, unacked_headers = self._unacked, self._unacked_headers
+                self._drop_unacked()
+                try:
+                    await unacked.ack(multiple=True)
+                except (aio_pika.exceptions.AMQPError,
+                        aio_pika.exceptions.ChannelInvalidStateError) as e:
+                    logging.error("PV: Can't acknowledge messages: %s", e)
+                else:
+                    for headers in unacked_headers:
+                        self._observe_publish_to_ack(headers)
+            if self._unacked is None:
+                acked_at = time.monotonic()
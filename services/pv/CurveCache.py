@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+def make_key(params: Tuple) -> str:
+    """
+    Returns hash of curve parameters.
+    """
+    return hashlib.sha1(repr(params).encode("utf-8")).hexdigest()[:16]
+
+
+class CurveCache:
+    """
+    Cache of day curves keyed by hash of their parameters, at most size
+    curves are kept in memory and the least recently used one is evicted.
+    With directory curves are also stored as "pv_curve_<key>.npy" files
+    and loaded memory-mapped, so restarted simulators and replicas don't
+    compute them again.
+    """
+
+    def __init__(self, size: int = 16, directory: str = None):
+        self._size = max(size, 1)
+        self._directory = directory
+        self._curves = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, params: Tuple, make_curve: Callable[[], np.ndarray]
+            ) -> np.ndarray:
+        """
+        Returns read-only curve of params, makes it with make_curve() when
+        it is neither in memory nor on disk.
+        """
+        key = make_key(params)
+        with self._lock:
+            curve = self._curves.get(key)
+            if curve is not None:
+                self._curves.move_to_end(key)
+                return curve
+        curve = self._load(key)
+        if curve is None:
+            curve = make_curve()
+            curve.flags.writeable = False
+            curve = self._store(key, curve)
+        with self._lock:
+            self._curves[key] = curve
+            while len(self._curves) > self._size:
+                self._curves.popitem(last=False)
+        return curve
+
+    def __len__(self) -> int:
+        return len(self._curves)
+
+    def _get_filename(self, key: str) -> str:
+        return os.path.join(self._directory, f"pv_curve_{key}.npy")
+
+    def _load(self, key: str) -> Optional[np.ndarray]:
+        if self._directory is None:
+            return None
+        try:
+            return np.load(self._get_filename(key), mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error("PV: Can't load curve %s: %s", key, e)
+            return None
+
+    def _store(self, key: str, curve: np.ndarray) -> np.ndarray:
+        """
+        Writes curve to file and returns it memory-mapped, returns curve
+        itself when there is no directory or file can't be written.
+        """
+        if self._directory is None:
+            return curve
+        filename = self._get_filename(key)
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(f"{filename}.{os.getpid()}.tmp", "wb") as curve_file:
+                np.save(curve_file, curve)
+            os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+            return np.load(filename, mmap_mode="r")
+        except OSError as e:
+            logging.error("PV: Can't store curve %s: %s", key, e)
+            return curve
+
+
+@lru_cache(maxsize=None)
+def get_curve_cache(size: int, directory: str = None) -> CurveCache:
+    """
+    Returns curve cache shared by PV simulators of the process.
+    """
+    return CurveCache(size, directory)
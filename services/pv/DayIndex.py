@@ -0,0 +1,235 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from pv.Archiver import ArchiveReader
+from pv.DayStats import COLUMNS, DayStats
+from pv.DayWriter import DTYPE, HEADER
+
+HOURS = 24
+PARALLEL_SCANS = 4
+
+
+def read_source(source: Tuple, start: int = 0, end: int = None) -> bytes:
+    """
+    Reads bytes start:end of day file source: ("file", filename) or
+    ("archive", prefix, day, name) of a day moved to archive. Archived
+    file is decompressed up to end, see ArchiveReader.read().
+    """
+    if source[0] == "archive":
+        return ArchiveReader(source[1]).read(source[2], source[3], start, end)
+    with open(source[1], "rb") as day_file:
+        day_file.seek(start)
+        return day_file.read(-1 if end is None else end - start)
+
+
+def parse_records(data: bytes, output_format: str,
+                  delimiter: str) -> np.ndarray:
+    """
+    Parses records of a part of day file without header.
+    """
+    if output_format == "npy":
+        return np.frombuffer(data, dtype=DTYPE).reshape(-1, len(HEADER))
+    separator = delimiter.encode()
+    return np.array([list(map(int, line.split(separator)))
+                     for line in data.splitlines() if line],
+                    dtype=np.int64).reshape(-1, len(HEADER))
+
+
+def parse_day(data: bytes, output_format: str, delimiter: str
+              ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parses whole day file, returns records and byte offsets of every
+    record and of the end of file.
+    """
+    if output_format == "npy":
+        rows = np.load(BytesIO(data))
+        row_size = DTYPE.itemsize * len(HEADER)
+        first = len(data) - len(rows) * row_size
+        return rows, first + np.arange(len(rows) + 1) * row_size
+    first = data.index(b"\n") + 1
+    lines = data[first:].splitlines(keepends=True)
+    offsets = np.cumsum([first] + [len(line) for line in lines])
+    return parse_records(data[first:], output_format, delimiter), offsets
+
+
+def scan_day(source: Tuple, output_format: str, delimiter: str,
+             time_iter: int) -> dict:
+    """
+    Reads day file and returns its summary and byte offsets of the first
+    record of every hour and of the end of records.
+    """
+    rows, offsets = parse_day(read_source(source), output_format, delimiter)
+    hours = np.minimum(rows[:, 0] * time_iter // 3600, HOURS - 1)
+    first_rows = np.searchsorted(hours, np.arange(HOURS + 1))
+    return {"summary": DayStats(time_iter, 1).add_rows(rows).summary(),
+            "offsets": offsets[first_rows].tolist()}
+
+
+def scan_hours(source: Tuple, start: int, end: int, output_format: str,
+               delimiter: str, time_iter: int) -> dict:
+    """
+    Reads records between byte offsets start and end of day file and
+    returns their summary.
+    """
+    rows = parse_records(read_source(source, start, end), output_format,
+                         delimiter)
+    return DayStats(time_iter, 1).add_rows(rows).summary()
+
+
+def aggregate(summaries: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Returns summary of several days: days and readings count, minimum,
+    maximum, mean and energy (kWh) of every column.
+    """
+    total = {"days": 0, "readings": 0}
+    sums = dict.fromkeys(COLUMNS, 0.0)
+    for summary in summaries:
+        total["days"] += 1
+        if not summary["readings"]:
+            continue
+        total["readings"] += summary["readings"]
+        for name in COLUMNS:
+            for statistic, pick in (("min", min), ("max", max)):
+                key = f"{name}_{statistic}"
+                total[key] = pick(total.get(key, summary[key]), summary[key])
+            total[f"{name}_kwh"] = total.get(f"{name}_kwh", 0.0) + \
+                summary[f"{name}_kwh"]
+            sums[name] += summary[f"{name}_mean"] * summary["readings"]
+    for name in COLUMNS:
+        total.setdefault(f"{name}_min", 0)
+        total.setdefault(f"{name}_max", 0)
+        total.setdefault(f"{name}_kwh", 0.0)
+        total[f"{name}_mean"] = sums[name] / total["readings"] \
+            if total["readings"] else 0.0
+    return total
+
+
+class DayIndex:
+    """
+    Index of finished day files "<prefix>_day_index.json": size and
+    modification time of every day file of filename_pattern ("{day}" is
+    the day), its summary (DayStats) and byte offsets of the first record
+    of every hour. update() scans only new and changed files, days moved
+    to archives by DayArchiver stay indexed.
+    Aggregations of days are answered from the index, only records of
+    some hours are read from day files by their offsets. Archived day
+    files are decompressed up to the last of these hours. Scans run in a
+    pool of workers processes when there are more than PARALLEL_SCANS.
+    """
+
+    def __init__(self, prefix: str, filename_pattern: str, output_format: str,
+                 delimiter: str, time_iter: int, workers: int = None):
+        self.filename = f"{prefix}_day_index.json"
+        self.days = {}
+        self._prefix = prefix
+        self._directory = os.path.dirname(filename_pattern) or "."
+        self._pattern = os.path.basename(filename_pattern)
+        self._regex = re.compile(re.escape(self._pattern).replace(
+            re.escape("{day}"), r"(\d+)"))
+        self._output_format = output_format
+        self._delimiter = delimiter
+        self._time_iter = time_iter
+        self._workers = workers
+
+    def load(self) -> "DayIndex":
+        try:
+            with open(self.filename) as index_file:
+                self.days = json.load(index_file)
+        except FileNotFoundError:
+            self.days = {}
+        return self
+
+    def save(self):
+        with open(self.filename + ".tmp", "w") as index_file:
+            json.dump(self.days, index_file, sort_keys=True)
+        os.replace(self.filename + ".tmp", self.filename)
+
+    def update(self) -> "DayIndex":
+        """
+        Loads index and indexes new and changed day files and archived
+        days, which are not indexed yet. Days whose files are removed are
+        dropped.
+        """
+        self.load()
+        scans = {}
+        for name in os.listdir(self._directory):
+            match = self._regex.fullmatch(name)
+            if match is None:
+                continue
+            filename = os.path.join(self._directory, name)
+            stat = os.stat(filename)
+            entry = self.days.get(match.group(1))
+            if entry is None or entry.get("size") != stat.st_size or \
+                    entry.get("mtime") != stat.st_mtime_ns:
+                scans[match.group(1)] = (("file", filename),
+                                         {"size": stat.st_size,
+                                          "mtime": stat.st_mtime_ns})
+        archive_reader = ArchiveReader(self._prefix)
+        archived = set(archive_reader.days())
+        for day in list(self.days):
+            if day in scans or os.path.isfile(
+                    os.path.join(self._directory, self._get_name(day))):
+                continue
+            if int(day) in archived:
+                self.days[day]["archived"] = True
+            else:
+                del self.days[day]
+        for day in archived:
+            name = self._get_name(day)
+            if str(day) not in self.days and str(day) not in scans and \
+                    name in archive_reader.members(day):
+                scans[str(day)] = (("archive", self._prefix, day, name),
+                                   {"archived": True})
+        entries = self._map(scan_day, [
+            (source, self._output_format, self._delimiter, self._time_iter)
+            for source, _ in scans.values()])
+        for (day, (_, entry)), scanned in zip(scans.items(), entries):
+            self.days[day] = dict(entry, **scanned)
+        self.save()
+        return self
+
+    def _get_name(self, meter_day) -> str:
+        return self._pattern.replace("{day}", str(meter_day))
+
+    def _get_source(self, meter_day: int) -> Tuple:
+        name = self._get_name(meter_day)
+        if self.days[str(meter_day)].get("archived"):
+            return "archive", self._prefix, meter_day, name
+        return "file", os.path.join(self._directory, name)
+
+    def _map(self, function: Callable, tasks: List[tuple]) -> List:
+        """
+        Calls function with arguments of every task, in a process pool when
+        there are many tasks.
+        """
+        if len(tasks) > PARALLEL_SCANS and self._workers != 1:
+            with ProcessPoolExecutor(self._workers) as executor:
+                return list(executor.map(function, *zip(*tasks)))
+        return [function(*task) for task in tasks]
+
+    def query(self, first_day: int = None, last_day: int = None,
+              hours: Tuple[int, int] = None) -> Dict[int, Dict[str, float]]:
+        """
+        Returns summaries of indexed days from first_day to last_day. With
+        hours (first, last) summaries are of records of these hours only.
+        """
+        days = sorted(day for day in map(int, self.days)
+                      if (first_day is None or day >= first_day) and
+                      (last_day is None or day <= last_day))
+        if hours is None:
+            return {day: self.days[str(day)]["summary"] for day in days}
+        first_hour, last_hour = hours
+        tasks = []
+        for day in days:
+            offsets = self.days[str(day)]["offsets"]
+            tasks.append((self._get_source(day), offsets[first_hour],
+                          offsets[min(last_hour, HOURS - 1) + 1],
+                          self._output_format, self._delimiter,
+                          self._time_iter))
+        return dict(zip(days, self._map(scan_hours, tasks)))
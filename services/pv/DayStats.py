@@ -0,0 +1,111 @@
+import os
+from typing import Dict, List, Tuple
+
+from pv.DayWriter import HEADER
+from pv.PvCurve import SECONDS_PER_DAY
+
+COLUMNS = HEADER[1:]
+SUMMARY_HEADER = ["day", "readings"] + [
+    f"{column}_{statistic}" for column in COLUMNS
+    for statistic in ("min", "max", "mean", "kwh")]
+
+
+class DayStats:
+    """
+    Running statistics of one day output, updated with every record:
+    minimum, maximum and mean of meter, pv and sum columns, their energy
+    (kWh) and a series downsampled to at most points averages of
+    consecutive iterations, so END needs no re-reading of the day file.
+    """
+
+    def __init__(self, time_iter: int, points: int):
+        iterations = SECONDS_PER_DAY // time_iter
+        self._kwh_iter = time_iter / 3600 / 1000
+        self._bucket_size = max(1, -(-iterations // points))
+        buckets = max(1, -(-iterations // self._bucket_size))
+        self.count = 0
+        self._min = [float("inf")] * len(COLUMNS)
+        self._max = [float("-inf")] * len(COLUMNS)
+        self._sum = [0] * len(COLUMNS)
+        self._bucket_sums = [[0] * len(COLUMNS) for _ in range(buckets)]
+        self._bucket_counts = [0] * buckets
+
+    def add(self, timestamp: int, *values: int):
+        """
+        Adds record of iteration timestamp with meter, pv and sum values.
+        """
+        self.count += 1
+        bucket = min((timestamp - 1) // self._bucket_size,
+                     len(self._bucket_counts) - 1)
+        self._bucket_counts[bucket] += 1
+        bucket_sums = self._bucket_sums[bucket]
+        for column, value in enumerate(values):
+            if value < self._min[column]:
+                self._min[column] = value
+            if value > self._max[column]:
+                self._max[column] = value
+            self._sum[column] += value
+            bucket_sums[column] += value
+
+    def add_rows(self, rows) -> "DayStats":
+        """
+        Adds records of rows with timestamp, meter, pv and sum columns,
+        e.g. read from day file which was resumed after a failure.
+        """
+        for row in rows.tolist():
+            self.add(*row)
+        return self
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns readings count and minimum, maximum, mean and energy (kWh)
+        of every column.
+        """
+        summary = {"readings": self.count}
+        for column, name in enumerate(COLUMNS):
+            if self.count:
+                summary[f"{name}_min"] = self._min[column]
+                summary[f"{name}_max"] = self._max[column]
+                summary[f"{name}_mean"] = self._sum[column] / self.count
+            else:
+                summary[f"{name}_min"] = summary[f"{name}_max"] = 0
+                summary[f"{name}_mean"] = 0.0
+            summary[f"{name}_kwh"] = self._sum[column] * self._kwh_iter
+        return summary
+
+    def series(self) -> Tuple[List[float], Dict[str, List[float]]]:
+        """
+        Returns timestamps of middles of non-empty buckets and averages
+        of every column in them.
+        """
+        timestamps = []
+        columns = {name: [] for name in COLUMNS}
+        for bucket, count in enumerate(self._bucket_counts):
+            if count:
+                timestamps.append((bucket + 0.5) * self._bucket_size + 0.5)
+                for name, value in zip(COLUMNS, self._bucket_sums[bucket]):
+                    columns[name].append(value / count)
+        return timestamps, columns
+
+    def write_summary(self, filename: str, meter_day: int, delimiter: str):
+        """
+        Appends summary record of the day to csv file.
+        """
+        with open(filename, 'a') as summary_file:
+            if summary_file.tell() == 0:
+                summary_file.write(delimiter.join(SUMMARY_HEADER) + "\n")
+            summary_file.write(
+                format_summary(meter_day, self.summary(), delimiter) + "\n")
+            summary_file.flush()
+            os.fsync(summary_file.fileno())
+
+
+def format_summary(label, summary: Dict[str, float], delimiter: str) -> str:
+    """
+    Formats summary as record of SUMMARY_HEADER columns, label is the day
+    or e.g. range of days.
+    """
+    values = [str(label), str(summary["readings"])] + [
+        f"{summary[name]:.3f}" if isinstance(summary[name], float)
+        else str(summary[name]) for name in SUMMARY_HEADER[2:]]
+    return delimiter.join(values)
@@ -0,0 +1,254 @@
+import csv
+import os
+import time
+from io import BytesIO
+from typing import Iterable, NamedTuple, Tuple
+
+import numpy as np
+
+
+class DayRecord(NamedTuple):
+    """
+    Record of one iteration of day output. It is a plain tuple, so it is
+    written as row without conversion and takes no per-record dict.
+    """
+    timestamp: int
+    meter: int
+    pv: int
+    sum: int
+
+
+HEADER = list(DayRecord._fields)
+DTYPE = np.dtype("<i4")
+CHECKPOINT_SUFFIX = ".ckpt"
+
+
+class DayWriter:
+    """
+    Writer of one day output file. File stays open from first record until
+    close(), records are buffered in memory and written when buffer_size
+    records are collected or flush_interval seconds passed since last write,
+    pending is the quantity of records still in memory.
+    Records of iterations which are already written are skipped as
+    duplicates of redelivered messages. A record of an earlier iteration,
+    e.g. published again by meter after broker rejected it, is written
+    too, records of the file are sorted by iteration on close().
+    With checkpoint every flush syncs the file and records the last written
+    iteration and file size to "<filename>.ckpt". File left by a failure
+    is truncated to its checkpoint when it is opened again.
+    """
+
+    def __init__(self, filename: str, delimiter: str, buffer_size: int,
+                 flush_interval: float, checkpoint: bool = False):
+        self._filename = filename
+        self._delimiter = delimiter
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._checkpoint = checkpoint
+        self._rows = []
+        self._iterations = set()
+        self._ordered = True
+        self.last_iteration = 0
+        if checkpoint:
+            self._restore()
+        self._open(filename, delimiter)
+        self._flushed_at = time.monotonic()
+
+    def _restore(self):
+        """
+        Truncates file to size of its checkpoint. Messages are acknowledged
+        by Pv only after their rows are flushed and checkpointed, so rows
+        written after the checkpoint belong to unacknowledged messages and
+        are written again when broker delivers them again. Checkpoint
+        without file is left by a finished day and is removed.
+        """
+        if not os.path.isfile(self._filename):
+            remove_checkpoint(self._filename)
+            return
+        self.last_iteration, size = read_checkpoint(self._filename)
+        with open(self._filename, 'r+b') as data_file:
+            data_file.truncate(size)
+        iterations = self._read_rows()[:, 0].tolist()
+        self._iterations.update(iterations)
+        self._ordered = iterations == sorted(iterations)
+
+    def _read_rows(self) -> np.ndarray:
+        """
+        Returns records written to file.
+        """
+        with open(self._filename) as data_file:
+            lines = data_file.read().splitlines()[1:]
+        return np.array([line.split(self._delimiter) for line in lines
+                         if line], dtype=DTYPE).reshape(-1, len(HEADER))
+
+    def _save_rows(self, filename: str, rows: np.ndarray):
+        with open(filename, 'w') as data_file:
+            csv.writer(data_file, delimiter=self._delimiter).writerows(
+                [HEADER] + rows.tolist())
+
+    def _open(self, filename: str, delimiter: str):
+        self._file = open(filename, 'a')
+        self._csv_writer = csv.writer(self._file, delimiter=delimiter)
+        if self._file.tell() == 0:
+            self._rows.append(HEADER)
+
+    def _write_rows(self, rows: list):
+        self._csv_writer.writerows(rows)
+
+    def _finish(self):
+        pass
+
+    def write(self, row: Iterable) -> bool:
+        """
+        Adds record to buffer and flushes buffer if it is full or old.
+        Returns False when record is a duplicate and was skipped.
+        """
+        if row[0] in self._iterations:
+            return False
+        self._iterations.add(row[0])
+        if row[0] < self.last_iteration:
+            self._ordered = False
+        else:
+            self.last_iteration = row[0]
+        self._rows.append(row)
+        if len(self._rows) >= self._buffer_size or \
+                time.monotonic() - self._flushed_at >= self._flush_interval:
+            self.flush()
+        return True
+
+    @property
+    def pending(self) -> int:
+        """
+        Returns quantity of buffered records not written to file yet.
+        """
+        return len(self._rows)
+
+    def flush(self):
+        """
+        Writes buffered records to file.
+        """
+        if self._rows:
+            self._write_rows(self._rows)
+            self._rows = []
+            self._file.flush()
+            if self._checkpoint:
+                self._write_checkpoint()
+        self._flushed_at = time.monotonic()
+
+    def _write_checkpoint(self):
+        """
+        Syncs file to disk and replaces checkpoint with the last written
+        iteration and file size.
+        """
+        os.fsync(self._file.fileno())
+        checkpoint = self._filename + CHECKPOINT_SUFFIX
+        with open(checkpoint + ".tmp", 'w') as checkpoint_file:
+            checkpoint_file.write(
+                f"{self.last_iteration};{self._file.seek(0, os.SEEK_END)}\n")
+        os.replace(checkpoint + ".tmp", checkpoint)
+
+    def close(self):
+        """
+        Flushes buffered records, syncs file to disk and closes it. File
+        with records out of order is replaced with sorted one.
+        """
+        self.flush()
+        self._finish()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if not self._ordered:
+            self._sort()
+
+    def _sort(self):
+        """
+        Replaces file with a copy whose records are sorted by iteration.
+        """
+        rows = self._read_rows()
+        rows = rows[np.argsort(rows[:, 0], kind="stable")]
+        self._save_rows(self._filename + ".sorted", rows)
+        os.replace(self._filename + ".sorted", self._filename)
+
+
+class NpyDayWriter(DayWriter):
+    """
+    Writer of one day output file in NumPy .npy format: int32 array with
+    timestamp, meter, pv and sum columns. Records are appended as raw rows
+    after the header, the header gets the final row count on close().
+    """
+
+    def _open(self, filename: str, delimiter: str):
+        if os.path.isfile(filename) and os.path.getsize(filename):
+            self._file = open(filename, 'r+b')
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(filename, 'w+b')
+            self._file.write(self._make_header(0))
+
+    def _write_rows(self, rows: list):
+        self._file.write(np.asarray(rows, dtype=DTYPE).tobytes())
+
+    def _read_rows(self) -> np.ndarray:
+        with open(self._filename, 'rb') as data_file:
+            data_file.seek(len(self._make_header(0)))
+            data = data_file.read()
+        return np.frombuffer(data, dtype=DTYPE).reshape(-1, len(HEADER))
+
+    def _save_rows(self, filename: str, rows: np.ndarray):
+        with open(filename, 'wb') as data_file:
+            data_file.write(self._make_header(len(rows)))
+            data_file.write(np.ascontiguousarray(rows, dtype=DTYPE).tobytes())
+
+    def _finish(self):
+        header_size = len(self._make_header(0))
+        data_size = self._file.seek(0, os.SEEK_END) - header_size
+        header = self._make_header(data_size // (DTYPE.itemsize * len(HEADER)))
+        if len(header) != header_size:
+            raise ValueError(f"Header of {self._filename} changed its size")
+        self._file.seek(0)
+        self._file.write(header)
+
+    @staticmethod
+    def _make_header(rows: int) -> bytes:
+        header = BytesIO()
+        np.lib.format.write_array_header_1_0(
+            header, {"descr": DTYPE.str, "fortran_order": False,
+                     "shape": (rows, len(HEADER))})
+        return header.getvalue()
+
+
+DAY_WRITERS = {"csv": DayWriter, "npy": NpyDayWriter}
+
+
+def read_checkpoint(filename: str) -> Tuple[int, int]:
+    """
+    Returns the last written iteration and file size from checkpoint of
+    file, zeros when there is no checkpoint.
+    """
+    try:
+        with open(filename + CHECKPOINT_SUFFIX) as checkpoint_file:
+            iteration, size = checkpoint_file.read().split(";")
+        return int(iteration), int(size)
+    except FileNotFoundError:
+        return 0, 0
+
+
+def remove_checkpoint(filename: str):
+    """
+    Removes checkpoint of finished file.
+    """
+    try:
+        os.remove(filename + CHECKPOINT_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def read_day(filename: str, delimiter: str = ";") -> np.ndarray:
+    """
+    Reads finished day file to int32 array with timestamp, meter, pv and sum
+    columns. The .npy files are memory-mapped instead of read.
+    """
+    if filename.endswith(".npy"):
+        return np.load(filename, mmap_mode="r")
+    return np.loadtxt(filename, dtype=DTYPE, delimiter=delimiter, skiprows=1,
+                      ndmin=2)
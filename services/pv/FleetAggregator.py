@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+
+HEADER = ["meter_id", "meter", "pv", "sum"]
+
+
+class FleetAggregator:
+    """
+    Aggregates readings of a fleet of meters for one day.
+    Keeps energy of consumption, PV and their sum (Wh) per meter ID,
+    readings out of pv_min..pv_max range are skipped. Readings of an
+    iteration which is already added are skipped as duplicates.
+    With checkpoint_file flush() syncs totals and added iterations to it,
+    pending is the quantity of readings added since, and totals are
+    restored from it when aggregator of the day is made again.
+    """
+
+    def __init__(self, time_iter: int, pv_min: int, pv_max: int,
+                 checkpoint_file: str = None):
+        self._hours_iter = time_iter / 3600
+        self._pv_min = pv_min
+        self._pv_max = pv_max
+        self._checkpoint_file = checkpoint_file
+        self._totals = np.zeros((0, 3))
+        self._added = set()
+        self.pending = 0
+        if checkpoint_file is not None and os.path.isfile(checkpoint_file):
+            self._restore()
+
+    def _restore(self):
+        with np.load(self._checkpoint_file) as checkpoint:
+            self._totals = checkpoint["totals"]
+            self._added = set(map(tuple, checkpoint["added"].tolist()))
+
+    def add(self, first_meter: int, meter_values: np.ndarray,
+            pv_value: int, iteration: int = None) -> bool:
+        """
+        Adds readings of meters first_meter, first_meter + 1, ...
+        of one iteration with PV value of that iteration. Returns False
+        when readings are a duplicate and were skipped.
+        """
+        if iteration is not None:
+            if (iteration, first_meter) in self._added:
+                return False
+            self._added.add((iteration, first_meter))
+        last_meter = first_meter + len(meter_values)
+        if last_meter > len(self._totals):
+            totals = np.zeros((last_meter, 3))
+            totals[:len(self._totals)] = self._totals
+            self._totals = totals
+        in_range = (meter_values >= self._pv_min) & (
+                meter_values <= self._pv_max)
+        meter_energy = np.where(in_range, meter_values, 0) * self._hours_iter
+        pv_energy = in_range * (pv_value * self._hours_iter)
+        totals = self._totals[first_meter:last_meter]
+        totals[:, 0] -= meter_energy
+        totals[:, 1] += pv_energy
+        totals[:, 2] += pv_energy - meter_energy
+        if self._checkpoint_file is not None:
+            self.pending += len(meter_values)
+        return True
+
+    def totals(self) -> np.ndarray:
+        """
+        Returns meter, pv and sum energy (Wh) indexed by meter ID.
+        """
+        return self._totals
+
+    def flush(self):
+        """
+        Syncs totals and added iterations to checkpoint file, when some
+        readings were added since the last flush.
+        """
+        if not self.pending:
+            return
+        with open(self._checkpoint_file + ".tmp", "wb") as checkpoint:
+            np.savez(checkpoint, totals=self._totals,
+                     added=np.array(sorted(self._added),
+                                    dtype=np.int64).reshape(-1, 2))
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(self._checkpoint_file + ".tmp", self._checkpoint_file)
+        self.pending = 0
+
+    def write(self, filename: str, delimiter: str):
+        """
+        Writes totals of every meter to csv file.
+        """
+        meter_ids = np.arange(len(self._totals))
+        np.savetxt(filename, np.column_stack((meter_ids, self._totals)),
+                   fmt=["%d", "%.3f", "%.3f", "%.3f"], delimiter=delimiter,
+                   header=delimiter.join(HEADER), comments="")
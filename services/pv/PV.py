@@ -1,21 +1,106 @@
-import csv
 import logging
 import os
+import signal
+import struct
+import threading
+import time
 from datetime import datetime
 from random import randint
-from typing import List
+from typing import List, Tuple
 
-import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
 import pika
 
+from common.Broker import BrokerConnection
+from common.LogPipeline import setup_logging
+from common.Metrics import REGISTRY, start_metrics
+from common.Protocol import (BATCH_COMMAND, BATCH_HEADER, BATCH_READING,
+                             FLEET_COMMAND, FLEET_HEADER, FLEET_READING,
+                             decode_reading, is_binary)
+from pv.Archiver import DayArchiver
+from pv.CurveCache import get_curve_cache
+from pv.DayStats import DayStats
+from pv.DayWriter import (CHECKPOINT_SUFFIX, DAY_WRITERS, DayRecord,
+                          read_day, remove_checkpoint)
+from pv.FleetAggregator import FleetAggregator
+from pv.PlotWorker import PlotWorker, render_plot, render_series
+from pv.PvConfig import PvConfig
+from pv.PvCurve import PvCurve
+
+MESSAGES = REGISTRY.counter("pv_messages_total",
+                            "Messages received from broker")
+READINGS = REGISTRY.counter("pv_readings_total",
+                            "Meter's readings written to output")
+STAGES = {stage: REGISTRY.histogram("pv_stage_seconds",
+                                    "Time of processing stages of messages",
+                                    {"stage": stage})
+          for stage in ("parse", "generate", "write", "plot")}
+PUBLISH_TO_ACK = REGISTRY.histogram(
+    "pv_publish_to_ack_seconds",
+    "Time from publishing message by meter to its acknowledge")
+DAY_SECONDS = REGISTRY.histogram(
+    "pv_day_seconds", "Time from START to END of a day",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+QUEUE_DEPTH = REGISTRY.gauge("pv_queue_depth",
+                             "Messages waiting in consumed queues")
+
+
+def make_day_filename(output_file: str, output_format: str, meter_day) -> str:
+    """
+    Makes filename of data file of the day, meter_day may be a placeholder,
+    e.g. "{day}" to find day files.
+    """
+    if ".csv" in output_file:
+        return f"{output_file.split('.csv')[0]}_day{meter_day}.{output_format}"
+    if output_format == "npy":
+        return f"day{meter_day}_{output_file}.npy"
+    return f"day{meter_day}_{output_file}"
+
+
+def make_output_prefix(output_file: str) -> str:
+    """
+    Makes prefix of files about all days: archives and indexes.
+    """
+    if ".csv" in output_file:
+        return output_file.split('.csv')[0]
+    return output_file
+
 
 class Pv:
     """
     Class receiving consumer's meter value from a broker, generating PV value,
     writing to a file and makes plot of output data.
     Should provide broker's host, port, queue, username, password.
+    With shard_count > 1 PV simulator consumes only queues
+    "<broker_queue>.<shard>" of its own shards.
+    Readings of a fleet of meters (FLEET messages) are aggregated per
+    meter ID and written to "<output_file>_day<N>_fleet.csv" at END, with
+    output_checkpoint their totals are checkpointed like records.
+    Statistics of every day are kept while records arrive, at END summary
+    record is appended to "<output_file>_summary.csv" and plot is drawn
+    from series downsampled to stats_points points.
+    PV values of a whole day are computed once per configuration and kept
+    in a curve cache shared by simulators of the process, optionally
+    stored in curve_cache_dir for restarts and replicas.
+    Lost connection to broker is opened again with backoff from
+    broker_reconnect_delay up to broker_reconnect_max_delay seconds.
+    Up to prefetch_count messages are delivered ahead. Messages are
+    acknowledged only when their records are written to output files, so
+    buffered records of a failed PV simulator are delivered again. Buffered
+    records are written when prefetch_count messages wait for acknowledge
+    and every output_flush_interval seconds. SIGTERM stops PV simulator
+    like Ctrl+C.
+    With archive_after_days > 0 files of finished days are rolled into
+    compressed archives of archive_days days in background.
+    Plotting libraries are loaded only when the first plot is drawn, with
+    plot_enabled False plots are not drawn and they are never loaded.
     """
+    _curve = None
+    _day_curve = None
+    _curve_cache = None
+    _archiver = None
+    _plot_futures = {}
+    _broker = None
 
     def __init__(self, broker_host: str, broker_port: int, broker_queue: str,
                  broker_username: str,
@@ -26,7 +111,22 @@ class Pv:
                  execute_time_log: str, pv_sunrise_start: int,
                  pv_sunrise_end: int, pv_zenith: int, pv_sundown_start: int,
                  pv_sundown_end: int, pv_light_eff_lw: int,
-                 pv_light_eff_std: int, pv_max_power: int):
+                 pv_light_eff_std: int, pv_max_power: int,
+                 output_buffer_size: int = 1000,
+                 output_flush_interval: float = 5.0,
+                 output_format: str = "csv", plot_workers: int = 1,
+                 plot_queue_size: int = 4, shard_count: int = 1,
+                 shards: List[int] = None, log_sample_rate: int = 1,
+                 log_rate_limit: int = 0, log_format: str = "text",
+                 metrics_port: int = 0, metrics_file: str = None,
+                 metrics_interval: float = 10.0,
+                 output_checkpoint: bool = True, stats_points: int = 288,
+                 curve_cache_size: int = 16, curve_cache_dir: str = None,
+                 archive_after_days: int = 0, archive_days: int = 30,
+                 archive_retention_days: int = 0, plot_enabled: bool = True,
+                 broker_reconnect_delay: float = 1.0,
+                 broker_reconnect_max_delay: float = 30.0,
+                 prefetch_count: int = 100):
         self._logfile = logfile
         self._broker_host = broker_host
         self._broker_port = broker_port
@@ -41,8 +141,15 @@ class Pv:
         self._time_iter = time_iter
         self._execute_time_log = execute_time_log
         self._start_time = 0
+        self._start_times = {}
+        self._day_started = {}
         self._credentials = pika.PlainCredentials(self._broker_username,
                                                   self._broker_password)
+        self._broker_reconnect_delay = broker_reconnect_delay
+        self._broker_reconnect_max_delay = broker_reconnect_max_delay
+        self._prefetch_count = prefetch_count
+        self._unacked_tag = None
+        self._unacked_headers = []
         self._environment_pv = environment_pv
         self._pv_sunrise_start = self._get_fraction_time(pv_sunrise_start)
         self._pv_sunrise_end = self._get_fraction_time(pv_sunrise_end)
@@ -52,24 +159,76 @@ class Pv:
         self._pv_light_eff_lw = pv_light_eff_lw
         self._pv_light_eff_std = pv_light_eff_std
         self._pv_max_power = pv_max_power
-        logging.basicConfig(filename=logfile, filemode="a", level=logging.INFO,
-                            format='%(asctime)s %(message)s',
-                            datefmt='%Y-%m-%d %H:%M:%S %p')
+        self._output_buffer_size = output_buffer_size
+        self._output_flush_interval = output_flush_interval
+        if output_format not in DAY_WRITERS:
+            raise ValueError(f"Unknown output format {output_format}, "
+                             f"expected one of {', '.join(DAY_WRITERS)}")
+        self._output_format = output_format
+        self._output_checkpoint = output_checkpoint
+        self._day_writers = {}
+        self._day_stats = {}
+        self._stats_points = stats_points
+        self._fleets = {}
+        self._metrics_port = metrics_port
+        self._metrics_file = metrics_file
+        self._metrics_interval = metrics_interval
+        self._shard_count = shard_count
+        if shards is None:
+            shards = list(range(shard_count))
+        self._shards = shards
+        self._plot_enabled = plot_enabled
+        if plot_enabled and plot_workers > 0:
+            self._plot_worker = PlotWorker(plot_workers, plot_queue_size)
+        else:
+            self._plot_worker = None
+        if archive_after_days > 0:
+            self._archiver = DayArchiver(
+                self._make_archive_prefix(), self._get_day_filenames,
+                archive_after_days, archive_days, archive_retention_days,
+                owns_day=self._owns_day,
+                get_pending=lambda day: self._plot_futures.pop(day, None))
+            self._plot_futures = {}
+        self._curve_cache = get_curve_cache(curve_cache_size,
+                                            curve_cache_dir or None)
+        self._get_day_curve()
+        setup_logging(logfile, log_sample_rate, log_rate_limit, log_format)
+
+    @classmethod
+    def from_config(cls, config: PvConfig, **kwargs) -> "Pv":
+        """
+        Makes PV simulator of config without CONSUMER_FIELDS, kwargs are
+        extra parameters of subclasses.
+        """
+        return cls(**config.pv_kwargs(), **kwargs)
+
+    def _get_broker(self) -> BrokerConnection:
+        """
+        Returns connection manager of consumed queues, creating it on first
+        use.
+        """
+        if self._broker is None:
+            self._broker = BrokerConnection(
+                pika.ConnectionParameters(self._broker_host,
+                                          port=self._broker_port,
+                                          credentials=self._credentials),
+                [(queue, self._get_queue_arguments())
+                 for queue in self._get_queues()], "PV",
+                prefetch_count=self._prefetch_count,
+                initial_delay=self._broker_reconnect_delay,
+                max_delay=self._broker_reconnect_max_delay)
+        return self._broker
 
-    def _connect_broker(self):
+    def _connect_broker(self, attempts: int = 1):
         """
-        Connects to broker. Returns channel.
+        Connects to broker, attempts None retries until connected.
+        Returns channel.
         :return:
         """
         logging.info("PV: Connecting to broker")
         try:
-            self._connection = pika.BlockingConnection(
-                pika.ConnectionParameters(self._broker_host,
-                                          port=self._broker_port,
-                                          credentials=self._credentials))
-            channel = self._connection.channel()
-            channel.basic_qos(prefetch_count=1)
-            channel.queue_declare(queue=self._broker_queue, durable=True)
+            channel = self._get_broker().connect(attempts)
+            self._connection = self._broker.connection
             return channel
         except pika.exceptions.ConnectionClosedByBroker as e:
             logging.error("PV: Connection to broker closed by broker: %s", e)
@@ -77,85 +236,358 @@ class Pv:
             logging.error("PV: Connection to broker failed: %s", e)
         except Exception as e:
             logging.error("PV: Error: %s", e)
-        else:
-            logging.info("PV: Connected to broker")
         return None
 
     def start(self):
         """
-        Connects to broker and receives meter's value.
+        Connects to broker and receives meter's value. When connection is
+        lost PV simulator connects again and continues consuming,
+        redelivered messages are skipped as duplicates.
         :return:
         """
         logging.info("PV: Starting PV")
-        channel = self._connect_broker()
-        if channel is not None:
-            self._get_value_from_broker(channel)
+        start_metrics(self._metrics_port, self._metrics_file,
+                      self._metrics_interval)
+        self._stop_on_sigterm()
+        while True:
+            channel = self._connect_broker(attempts=None)
+            if channel is None or not self._get_value_from_broker(channel):
+                break
+
+    @staticmethod
+    def _stop_on_sigterm():
+        """
+        Makes SIGTERM of docker stop raise KeyboardInterrupt like Ctrl+C,
+        so PV simulator writes buffered records before it exits.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
 
-    def _get_value_from_broker(self, channel: pika.channel.Channel):
+    def _get_value_from_broker(self, channel: pika.channel.Channel) -> bool:
+        """
+        Consumes queues until PV simulator is stopped or connection to
+        broker is lost. Returns True when connection is lost, unacknowledged
+        messages are delivered again then.
+        """
+        self._unacked_tag = None
+        self._unacked_headers = []
         try:
-            channel.basic_consume(queue=self._broker_queue,
-                                  on_message_callback=self._callback)
+            for queue in self._get_queues():
+                channel.basic_consume(queue=queue,
+                                      on_message_callback=self._callback)
+            self._update_queue_depth(channel)
+            self._schedule_flush(channel)
             channel.start_consuming()
         except pika.exceptions.ConnectionClosedByBroker as e:
             logging.error("PV: Connection to broker closed by broker: %s", e)
-        except pika.exceptions.AMQPConnectionError as e:
-            logging.error("PV: Connection to broker failed: %s", e)
+            return True
+        except pika.exceptions.AMQPError as e:
+            logging.error("PV: Connection to broker lost: %s", e)
+            return True
         except KeyboardInterrupt as e:
             channel.stop_consuming()
-            self._connection.close()
+            self._stop()
+            self._ack_written(channel)
+            self._broker.close()
             logging.info("PV: Stopped PV")
         except Exception as e:
             logging.error("PV: Error: %s", e)
+        return False
 
     def _callback(self, ch, method, properties, body):
         """
-        Callback function for receiving meter's value.
+        Callback function for receiving meter's value. Message is
+        acknowledged together with earlier ones when their records are
+        written to output files. A message which can't be parsed is
+        rejected, so it is not delivered again.
+        """
+        try:
+            self._handle_message(body,
+                                 getattr(properties, "content_type", None))
+        except (ValueError, struct.error) as e:
+            logging.error("PV: Can't process message %s: %s", body, e)
+            ch.basic_reject(delivery_tag=method.delivery_tag, requeue=False)
+            return
+        self._unacked_tag = method.delivery_tag
+        self._unacked_headers.append(getattr(properties, "headers", None))
+        if self._prefetch_count and \
+                len(self._unacked_headers) >= self._prefetch_count:
+            self._flush_output()
+        self._ack_written(ch)
+
+    def _ack_written(self, channel: pika.channel.Channel):
+        """
+        Acknowledges received messages with multiple=True when no records
+        wait in buffers of output files.
+        """
+        if self._unacked_tag is None or any(
+                writer.pending for writer in self._day_writers.values()) or \
+                any(fleet.pending for fleet in self._fleets.values()):
+            return
+        channel.basic_ack(delivery_tag=self._unacked_tag, multiple=True)
+        for headers in self._unacked_headers:
+            self._observe_publish_to_ack(headers)
+        self._unacked_tag = None
+        self._unacked_headers = []
+
+    def _schedule_flush(self, channel: pika.channel.Channel):
+        """
+        Writes buffered records and acknowledges their messages every
+        output flush interval, also when no more messages arrive.
+        """
+        self._flush_output()
+        self._ack_written(channel)
+        self._connection.call_later(self._output_flush_interval,
+                                    lambda: self._schedule_flush(channel))
+
+    def _observe_publish_to_ack(self, headers: dict):
+        """
+        Observes time since meter published acknowledged message.
+        """
+        if headers and "published_at" in headers:
+            PUBLISH_TO_ACK.observe(time.time() - headers["published_at"])
+
+    def _update_queue_depth(self, channel: pika.channel.Channel):
+        """
+        Updates depth of consumed queues every metrics interval.
+        """
+        try:
+            QUEUE_DEPTH.set(sum(
+                channel.queue_declare(queue=queue, durable=True, passive=True,
+                                      arguments=self._get_queue_arguments()
+                                      ).method.message_count
+                for queue in self._get_queues()))
+        except Exception as e:
+            logging.error("PV: Can't get depth of queues: %s", e)
+        self._connection.call_later(self._metrics_interval,
+                                    lambda: self._update_queue_depth(channel))
+
+    def _get_queues(self) -> List[str]:
+        """
+        Returns queues consumed by this PV simulator.
+        """
+        if self._shard_count > 1:
+            return [f"{self._broker_queue}.{shard}" for shard in self._shards]
+        return [self._broker_queue]
+
+    def _owns_day(self, meter_day: int) -> bool:
+        """
+        Returns True when day is routed to shards of this PV simulator.
+        """
+        if self._shard_count > 1:
+            return meter_day % self._shard_count in self._shards
+        return True
+
+    def _get_queue_arguments(self) -> dict:
+        """
+        Returns arguments of consumed queues. Shard queues have single
+        active consumer, so days are never processed by two PV simulators.
+        """
+        if self._shard_count > 1:
+            return {"x-single-active-consumer": True}
+        return None
+
+    def _flush_output(self):
+        """
+        Writes buffered records of all days to output files and
+        checkpoints fleet totals.
+        """
+        for day_writer in self._day_writers.values():
+            day_writer.flush()
+        for fleet in self._fleets.values():
+            fleet.flush()
+
+    def _stop(self):
+        """
+        Closes open output files, checkpoints fleet totals and waits for
+        queued plots.
+        """
+        for meter_day in list(self._day_writers):
+            self._close_output(meter_day)
+        for fleet in self._fleets.values():
+            fleet.flush()
+        if self._plot_worker is not None:
+            self._plot_worker.close()
+        if self._archiver is not None:
+            self._archiver.close()
+
+    def _handle_message(self, body: bytes, content_type: str = None):
+        """
+        Processes one message from broker. Messages of binary reading
+        content type are decoded by common.Protocol, others are text or
+        binary BATCH and FLEET messages.
         """
-        logging.info(f"PV: Received message {body}")
+        logging.info("PV: Received message %s", body)
+        MESSAGES.inc()
+
+        if is_binary(content_type):
+            with STAGES["parse"].time():
+                command_meter, meter_day, meter_iteration, meter_reading = \
+                    decode_reading(body)
+            if command_meter == "START":
+                self._start_day(meter_day, meter_iteration)
+            elif command_meter == "DATA":
+                self._process_reading(meter_day, meter_iteration,
+                                      meter_reading)
+            else:
+                self._end_day(meter_day)
+            return
+        if body.startswith(FLEET_COMMAND):
+            with STAGES["parse"].time():
+                meter_day, meter_iteration, first_meter, meter_values = \
+                    self._parse_fleet(body)
+            self._process_fleet(meter_day, meter_iteration, first_meter,
+                                meter_values)
+            return
+        if body.startswith(BATCH_COMMAND):
+            with STAGES["parse"].time():
+                meter_day, readings = self._parse_batch(body)
+            for meter_iteration, meter_reading in readings:
+                self._process_reading(meter_day, meter_iteration,
+                                      meter_reading)
+            return
 
         data_from_broker = body.decode("utf-8")
         command_meter, value = data_from_broker.split("::")
         if command_meter == "START":
-            self._start_time = int(value)
+            if self._delimiter in value:
+                meter_day, start_time = value.split(self._delimiter)
+                self._start_day(int(meter_day), int(start_time))
+            else:
+                self._start_time = int(value)
         elif command_meter == "DATA":
+            with STAGES["parse"].time():
+                meter_day, meter_iteration, meter_reading = \
+                    self._parse_data_string(value)
+            self._process_reading(meter_day, meter_iteration, meter_reading)
+        elif command_meter == "END":
             meter_day, meter_iteration, meter_reading = self._parse_data_string(
                 value)
-            if meter_reading < self._pv_min or meter_reading > self._pv_max:
-                logging.info(
-                    f"PV: Meter reading {meter_reading} is out of range")
+            self._end_day(meter_day)
+
+    def _start_day(self, meter_day: int, start_time: int):
+        """
+        Keeps start time of the day sent by meter.
+        """
+        self._start_times[meter_day] = start_time
+        self._day_started[meter_day] = time.monotonic()
+
+    def _end_day(self, meter_day: int):
+        """
+        Finishes output of the day and writes its execution time.
+        """
+        filename = self._finish_day(meter_day)
+        if self._archiver is not None:
+            self._archiver.day_finished(meter_day)
+        if meter_day in self._day_started:
+            DAY_SECONDS.observe(
+                time.monotonic() - self._day_started.pop(meter_day))
+        data_file = open(self._execute_time_log, 'a')
+
+        execution_time = int(datetime.now().timestamp()) - int(
+            self._start_times.pop(meter_day, self._start_time))
+        data_file.write(
+            f"Execution time of {filename}: {execution_time} seconds\n")
+        if execution_time > self._max_execute_time:
+            logging.info(
+                f"PV: Execution time of {filename} is too long:"\
+                    f"{execution_time} seconds")
+        data_file.close()
+
+    def _finish_day(self, meter_day: int) -> str:
+        """
+        Finishes output of the day: writes totals of the fleet, or renames
+        temporary file, writes summary record and makes plot. Statistics of
+        a day resumed after a failure are read from the finished file, fleet
+        totals from their checkpoint. END of a day without temporary file or
+        fleet totals, e.g. redelivered END, changes nothing. Returns name of
+        output file.
+        """
+        fleet = self._fleets.pop(meter_day, None)
+        filename = self._make_fleet_filename(meter_day)
+        if fleet is None and self._output_checkpoint and \
+                os.path.isfile(filename + CHECKPOINT_SUFFIX):
+            fleet = self._make_fleet(meter_day)
+        if fleet is not None:
+            logging.info(f"PV: Writing fleet totals to {filename}")
+            fleet.write(filename, self._delimiter)
+            remove_checkpoint(filename)
+            return filename
+        filename = self._make_filename(meter_day)
+        self._close_output(meter_day)
+        if not os.path.isfile(filename + ".tmp"):
+            if os.path.isfile(filename):
+                logging.info(f"PV: Day file {filename} is already finished")
             else:
+                logging.warning(f"PV: Day {meter_day} has no records or "
+                                f"fleet totals")
+            return filename
+        logging.info(f"PV: Renaming temporary file to {filename}")
+        os.replace(filename + ".tmp", filename)
+        remove_checkpoint(filename + ".tmp")
+        day_stats = self._day_stats.pop(meter_day, None)
+        if day_stats is None:
+            day_stats = DayStats(self._time_iter, self._stats_points).add_rows(
+                read_day(filename, self._delimiter))
+        day_stats.write_summary(self._make_summary_filename(), meter_day,
+                                self._delimiter)
+        if self._plot_enabled:
+            with STAGES["plot"].time():
+                self._make_plot(meter_day, day_stats)
+        return filename
+
+    def _process_fleet(self, meter_day: int, meter_iteration: int,
+                       first_meter: int, meter_values: np.ndarray):
+        """
+        Adds readings of the fleet of one iteration to totals of the day.
+        """
+        fleet = self._fleets.get(meter_day)
+        if fleet is None:
+            fleet = self._make_fleet(meter_day)
+            self._fleets[meter_day] = fleet
+        with STAGES["generate"].time():
+            pv_value = self._generate_pv_value(meter_day, meter_iteration)
+        if not fleet.add(first_meter, meter_values, pv_value,
+                         meter_iteration):
+            logging.info("PV: Skipping duplicate fleet readings of "
+                         "iteration %s", meter_iteration)
+            return
+        READINGS.inc(len(meter_values))
+
+    def _make_fleet(self, meter_day: int) -> FleetAggregator:
+        """
+        Makes aggregator of fleet totals of the day, restored from its
+        checkpoint left by a failure.
+        """
+        checkpoint_file = None
+        if self._output_checkpoint:
+            checkpoint_file = self._make_fleet_filename(
+                meter_day) + CHECKPOINT_SUFFIX
+        return FleetAggregator(self._time_iter, self._pv_min, self._pv_max,
+                               checkpoint_file)
+
+    def _process_reading(self, meter_day: int, meter_iteration: int,
+                         meter_reading: int):
+        """
+        Generates PV value for meter's reading and writes record to file.
+        """
+        if meter_reading < self._pv_min or meter_reading > self._pv_max:
+            logging.info("PV: Meter reading %s is out of range", meter_reading)
+        else:
+            with STAGES["generate"].time():
                 pv_value = self._generate_pv_value(meter_day, meter_iteration)
-                data_record = {
-                    "timestamp": meter_iteration,
-                    "meter_value": meter_reading * -1,
-                    "pv_value": pv_value,
-                    "sum": pv_value - meter_reading,
-                }
-                logging.info(f"PV: Writing data record {data_record} to file")
-                self._write_to_output(meter_day, data_record, command_meter)
-        elif command_meter == "END":
-            meter_day, meter_iteration, meter_reading = self._parse_data_string(
-                value)
-            filename = self._make_filename(meter_day)
-            logging.info(f"PV: Renaming temporary file to {filename}")
-            os.rename(filename + ".tmp", filename)
-            self._make_plot(meter_day)
-            data_file = open(self._execute_time_log, 'a')
-
-            execution_time = int(datetime.now().timestamp()) - int(
-                self._start_time)
-            data_file.write(
-                f"Execution time of {filename}: {execution_time} seconds\n")
-            if execution_time > self._max_execute_time:
-                logging.info(
-                    f"PV: Execution time of {filename} is too long:"\
-                        f"{execution_time} seconds")
-            data_file.close()
-        ch.basic_ack(delivery_tag=method.delivery_tag)
-
-    def _make_plot(self, meter_day: int):
-        """
-        Drawing a plot of daily data.
+            data_record = DayRecord(meter_iteration, -meter_reading, pv_value,
+                                    pv_value - meter_reading)
+            logging.info("PV: Writing data record %s to file", data_record)
+            with STAGES["write"].time():
+                self._write_to_output(meter_day, data_record, "DATA")
+            READINGS.inc()
+
+    def _make_plot(self, meter_day: int, day_stats: DayStats = None):
+        """
+        Drawing a plot of daily data, from downsampled series of day_stats
+        or from data file. Plot is rendered by background plot worker,
+        or inline when there are no plot workers.
         :param meter_day:
         :return:
         """
@@ -163,30 +595,104 @@ class Pv:
         plot_filename = self._make_plot_filename(meter_day)
         logging.info(f"PV: Making plot to {plot_filename}")
         try:
-            data_csv = pd.read_csv(filename, delimiter=";",
-                                   index_col='timestamp')
-            data_csv.plot()
-            plt.savefig(plot_filename)
+            future = None
+            if day_stats is not None:
+                timestamps, columns = day_stats.series()
+                if self._plot_worker is not None:
+                    future = self._plot_worker.submit_series(
+                        plot_filename, timestamps, columns)
+                else:
+                    render_series(plot_filename, timestamps, columns)
+            elif self._plot_worker is not None:
+                future = self._plot_worker.submit(
+                    filename, plot_filename, self._output_format,
+                    self._delimiter)
+            else:
+                render_plot(filename, plot_filename, self._output_format,
+                            self._delimiter)
+            if future is not None and self._archiver is not None:
+                self._plot_futures[meter_day] = future
         except Exception as e:
             logging.error(f"PV: Can't plot data to {plot_filename}! Error: {e}")
 
-    def _parse_data_string(self, data_string: str) -> List:
+    def _parse_data_string(self, data_string: str) -> Tuple[int, int, int]:
         """
         Parses data from broker and returns day, timestamp,
         generated value from meter.
         """
         meter_day, meter_iteration, meter_reading = data_string.split(
             self._delimiter)
-        return [int(meter_day), int(meter_iteration), int(meter_reading)]
+        return int(meter_day), int(meter_iteration), int(meter_reading)
+
+    def _parse_batch(self, body: bytes) -> (int, List):
+        """
+        Parses binary BATCH message from broker and returns day and list of
+        (timestamp, generated value from meter) pairs.
+        """
+        payload = memoryview(body)[len(BATCH_COMMAND):]
+        meter_day, count = BATCH_HEADER.unpack_from(payload)
+        readings = payload[BATCH_HEADER.size:]
+        if len(readings) != count * BATCH_READING.size:
+            raise ValueError(f"BATCH of day {meter_day} has "
+                             f"{len(readings)} bytes for {count} readings")
+        return meter_day, list(BATCH_READING.iter_unpack(readings))
+
+    def _parse_fleet(self, body: bytes) -> (int, int, int, np.ndarray):
+        """
+        Parses binary FLEET message from broker and returns day, timestamp,
+        first meter ID and generated values of meters.
+        """
+        payload = memoryview(body)[len(FLEET_COMMAND):]
+        meter_day, meter_iteration, first_meter, count = \
+            FLEET_HEADER.unpack_from(payload)
+        meter_values = np.frombuffer(payload, dtype=FLEET_READING,
+                                     offset=FLEET_HEADER.size)
+        if len(meter_values) != count:
+            raise ValueError(f"FLEET of day {meter_day} has "
+                             f"{len(meter_values)} readings instead of {count}")
+        return meter_day, meter_iteration, first_meter, meter_values
 
     def _make_filename(self, meter_day: int) -> str:
         """
         Makes filename for data file.
         :return:
         """
+        return make_day_filename(self._output_file, self._output_format,
+                                 meter_day)
+
+    def _make_fleet_filename(self, meter_day: int) -> str:
+        """
+        Makes filename for fleet totals file.
+        :return:
+        """
+        if ".csv" in self._output_file:
+            return f"{self._output_file.split('.csv')[0]}_day{meter_day}" \
+                   f"_fleet.csv"
+        return f"day{meter_day}_fleet_{self._output_file}"
+
+    def _make_summary_filename(self) -> str:
+        """
+        Makes filename for summary records of days.
+        :return:
+        """
         if ".csv" in self._output_file:
-            return f"{self._output_file.split('.csv')[0]}_day{meter_day}.csv"
-        return f"day{meter_day}_{self._output_file}"
+            return f"{self._output_file.split('.csv')[0]}_summary.csv"
+        return f"summary_{self._output_file}"
+
+    def _get_day_filenames(self, meter_day: int) -> List[str]:
+        """
+        Returns names of all output files of the day.
+        """
+        return [self._make_filename(meter_day),
+                self._make_plot_filename(meter_day),
+                self._make_fleet_filename(meter_day)]
+
+    def _make_archive_prefix(self) -> str:
+        """
+        Makes prefix of archives of days and their index.
+        :return:
+        """
+        return make_output_prefix(self._output_file)
 
     def _make_plot_filename(self, meter_day: int) -> str:
         """
@@ -197,79 +703,101 @@ class Pv:
             return f"{self._output_file.split('.csv')[0]}_day{meter_day}.png"
         return f"day{meter_day}_{self._output_file}.png"
 
-    def _write_to_output(self, meter_day: int, data_record: dict,
+    def _write_to_output(self, meter_day: int, data_record: DayRecord,
                          command_meter: str):
         """
-        Writes data record to output file.
+        Writes data record to output file and statistics of the day.
+        File is kept open until END of the day. A day is resumed from its
+        temporary file and checkpoint left by a failure, otherwise it starts
+        in a new temporary file, which replaces finished file of the day at
+        END.
         :return:
         """
-        filename = self._make_filename(meter_day) + ".tmp"
-        new_day = False
-        if not os.path.isfile(filename):
-            new_day = True
-        data_file = open(filename, 'a')
         if command_meter == "DATA":
-            csv_writer = csv.writer(data_file, delimiter=self._delimiter)
-            if new_day:
-                csv_writer.writerow(["timestamp", "meter", "pv", "sum"])
-            csv_writer.writerow(data_record.values())
-        data_file.close()
+            day_writer = self._day_writers.get(meter_day)
+            if day_writer is None:
+                filename = self._make_filename(meter_day)
+                if os.path.isfile(filename) and \
+                        not os.path.isfile(filename + ".tmp"):
+                    logging.warning("PV: Day file %s is written again and "
+                                    "is replaced at END", filename)
+                day_writer = DAY_WRITERS[self._output_format](
+                    filename + ".tmp", self._delimiter,
+                    self._output_buffer_size, self._output_flush_interval,
+                    self._output_checkpoint)
+                if day_writer.last_iteration:
+                    logging.warning(
+                        "PV: Resuming day %s after iteration %s", meter_day,
+                        day_writer.last_iteration)
+                    self._day_stats[meter_day] = None
+                else:
+                    self._day_stats[meter_day] = DayStats(self._time_iter,
+                                                          self._stats_points)
+                self._day_writers[meter_day] = day_writer
+            if not day_writer.write(data_record):
+                logging.info("PV: Skipping duplicate record %s", data_record)
+            elif self._day_stats.get(meter_day) is not None:
+                self._day_stats[meter_day].add(*data_record)
+
+    def _close_output(self, meter_day: int):
+        """
+        Flushes and closes output file of the day.
+        :return:
+        """
+        day_writer = self._day_writers.pop(meter_day, None)
+        if day_writer is not None:
+            day_writer.close()
 
     def _get_fraction_time(self, hour: int, minute: int = 0,
                            second: int = 0) -> float:
         """Convert time to fraction of the day"""
         return ((hour * 3600 + minute * 60) + second) / (24 * 3600)
 
-    def _get_parabola_vertex(self, x1: float, y1: float, x2: float, y2: float,
-                             x3: float,
-                             y3: float) -> (float, float, float):
-        """Calculate the vertex of a parabola given three points"""
+    def _get_curve(self) -> PvCurve:
+        """Returns PV curve, creating it on first use"""
+        if self._curve is None:
+            self._curve = PvCurve(self._pv_sunrise_start, self._pv_sunrise_end,
+                                  self._pv_zenith, self._pv_sundown_start,
+                                  self._pv_sundown_end, self._pv_light_eff_lw,
+                                  self._pv_light_eff_std, self._pv_max_power)
+        return self._curve
 
-        denom = (x1 - x2) * (x1 - x3) * (x2 - x3)
-        A = (x3 * (y2 - y1) + x2 * (y1 - y3) + x1 * (y3 - y2)) / denom
-        B = (x3 * x3 * (y1 - y2) +
-             x2 * x2 * (y3 - y1) +
-             x1 * x1 * (y2 - y3)) / denom
-        C = (x2 * x3 * (x2 - x3) * y1 +
-             x3 * x1 * (x3 - x1) * y2 +
-             x1 * x2 * (x1 - x2) * y3) / denom
+    def _get_curve_params(self) -> tuple:
+        """Returns parameters which PV values of a day depend on"""
+        return (self._pv_sunrise_start, self._pv_sunrise_end, self._pv_zenith,
+                self._pv_sundown_start, self._pv_sundown_end,
+                self._pv_light_eff_lw, self._pv_light_eff_std,
+                self._pv_max_power, self._time_iter)
 
-        return A, B, C
+    def _get_day_curve(self) -> np.ndarray:
+        """Returns PV values of a whole day indexed by iteration,
+        from the curve cache when there is one"""
+        if self._day_curve is None:
+            if self._curve_cache is None:
+                self._day_curve = self._get_curve().day(self._time_iter)
+            else:
+                self._day_curve = self._curve_cache.get(
+                    self._get_curve_params(),
+                    lambda: self._get_curve().day(self._time_iter))
+        return self._day_curve
 
     def _morning_strgt(self, x: float) -> float:
-        A = (self._pv_light_eff_lw * self._pv_max_power) / (
-                self._pv_sunrise_end - self._pv_sunrise_start)
-        B = A * self._pv_sunrise_start * -1
-        return A * x + B
+        return self._get_curve().morning(x)
 
     def _evening_strgt(self, x: float) -> float:
-        A = ((-self._pv_sunrise_end) * self._pv_max_power *
-             self._pv_light_eff_lw) / (self._pv_sundown_end -
-                                       self._pv_sundown_start)
-        B = A * self._pv_sundown_end * -1
-        return A * x + B
+        return self._get_curve().evening(x)
 
     def _parabola(self, x: float) -> float:
         """Calculate the parabola"""
-        (A, B, C) = self._get_parabola_vertex(
-            self._pv_sunrise_end, self._morning_strgt(self._pv_sunrise_end),
-            self._pv_zenith, (self._pv_light_eff_std * self._pv_max_power),
-            self._pv_sundown_start, self._evening_strgt(self._pv_sundown_start))
-        return A * (x ** 2) + (B * x) + C
+        return self._get_curve().parabola(x)
 
     def _generate_pv_value(self, meter_day: int, meter_iteration: int) -> int:
         """Generate PV curve using a straight for SUNRISE
-        a parabola for ZENITH and another straight for SUNDOWN"""
+        a parabola for ZENITH and another straight for SUNDOWN.
+        Value is looked up in the precomputed day curve."""
 
+        day_curve = self._get_day_curve()
+        if 0 <= meter_iteration < len(day_curve):
+            return int(day_curve[meter_iteration])
         time = self._get_fraction_time(0, 0, meter_iteration * self._time_iter)
-
-        if time >= self._pv_sunrise_start and time <= self._pv_sunrise_end:
-            value = self._morning_strgt(time)
-        elif time > self._pv_sunrise_end and time < self._pv_sundown_start:
-            value = self._parabola(time)
-        elif time >= self._pv_sundown_start and time <= self._pv_sundown_end:
-            value = self._evening_strgt(time)
-        else:
-            value = 0.0
-
-        return int(value)
+        return self._get_curve().value(time)
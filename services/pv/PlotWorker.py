@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List
+
+from common.Metrics import REGISTRY
+from pv.DayWriter import HEADER, read_day
+
+PLOT_SECONDS = REGISTRY.histogram(
+    "pv_plot_seconds", "Time from queueing plot to plot is ready",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60))
+
+
+def init_backend():
+    """
+    Selects non-interactive matplotlib backend and loads pyplot once
+    per process. It is called by plot functions, so matplotlib is loaded
+    only when the first plot is drawn.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+def render_plot(filename: str, plot_filename: str, output_format: str,
+                delimiter: str):
+    """
+    Drawing a plot of daily data file to plot_filename.
+    """
+    init_backend()
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    if output_format == "npy":
+        data_day = read_day(filename)
+        data_frame = pd.DataFrame(
+            data_day[:, 1:], columns=HEADER[1:],
+            index=pd.Index(data_day[:, 0], name=HEADER[0]))
+    else:
+        data_frame = pd.read_csv(filename, delimiter=delimiter,
+                                 index_col='timestamp')
+    axes = data_frame.plot()
+    axes.figure.savefig(plot_filename)
+    plt.close(axes.figure)
+
+
+def render_series(plot_filename: str, timestamps: List[float],
+                  columns: Dict[str, List[float]]):
+    """
+    Drawing a plot of downsampled daily series to plot_filename.
+    """
+    init_backend()
+    import matplotlib.pyplot as plt
+
+    figure, axes = plt.subplots()
+    for name, values in columns.items():
+        axes.plot(timestamps, values, label=name)
+    axes.set_xlabel(HEADER[0])
+    axes.legend()
+    figure.savefig(plot_filename)
+    plt.close(figure)
+
+
+class PlotWorker:
+    """
+    Renders plots in a pool of background processes, so consumer doesn't
+    wait for them. At most workers + queue_size plots are pending,
+    submit() blocks when this limit is reached.
+    Errors of rendering are written to log.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=init_backend,
+            mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, filename: str, plot_filename: str, output_format: str,
+               delimiter: str) -> Future:
+        """
+        Queues plot of daily data file, waits while queue is full.
+        """
+        return self._submit(plot_filename, render_plot, filename,
+                            plot_filename, output_format, delimiter)
+
+    def submit_series(self, plot_filename: str, timestamps: List[float],
+                      columns: Dict[str, List[float]]) -> Future:
+        """
+        Queues plot of downsampled daily series, waits while queue is full.
+        """
+        return self._submit(plot_filename, render_series, plot_filename,
+                            timestamps, columns)
+
+    def _submit(self, plot_filename: str, render, *args) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(render, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(partial(self._done, plot_filename,
+                                         time.monotonic()))
+        return future
+
+    def _done(self, plot_filename: str, submitted_at: float, future: Future):
+        self._slots.release()
+        PLOT_SECONDS.observe(time.monotonic() - submitted_at)
+        error = future.exception()
+        if error is not None:
+            logging.error(f"PV: Can't plot data to {plot_filename}! "
+                          f"Error: {error}")
+        else:
+            logging.info(f"PV: Plot {plot_filename} is ready")
+
+    def close(self):
+        """
+        Waits for queued plots and stops worker processes.
+        """
+        self._executor.shutdown(wait=True)
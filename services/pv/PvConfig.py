@@ -0,0 +1,80 @@
+from typing import List, NamedTuple, Optional
+
+from common.Config import read_environment
+
+CONSUMER_FIELDS = ("pv_consumer", "ack_batch_size", "ack_interval")
+
+
+class PvConfig(NamedTuple):
+    """
+    Immutable configuration of PV simulator with defaults of its
+    environment variables. Fields are keyword arguments of Pv, the config
+    is read once and shared by simulators of the process, except
+    CONSUMER_FIELDS choosing consumer class and its parameters.
+    """
+    broker_host: str = "rabbitmq"
+    broker_port: str = "5672"
+    broker_queue: str = "meter_simulator"
+    broker_username: str = "guest"
+    broker_password: str = "guest"
+    pv_min: int = 0
+    pv_max: int = 9000
+    output_file: str = "output.csv"
+    delimiter: str = ";"
+    logfile: str = "./log/pv.log"
+    environment_pv: str = "DEV"
+    max_execute_time: int = 60
+    time_iter: int = 60
+    execute_time_log: str = "./log/execute_time.log"
+    pv_sunrise_start: int = 6
+    pv_sunrise_end: int = 8
+    pv_zenith: int = 14
+    pv_sundown_start: int = 20
+    pv_sundown_end: int = 21
+    pv_light_eff_lw: float = 0.1
+    pv_light_eff_std: float = 0.8125
+    pv_max_power: int = 4000
+    output_buffer_size: int = 1000
+    output_flush_interval: float = 5.0
+    output_format: str = "csv"
+    plot_workers: int = 1
+    plot_queue_size: int = 4
+    shard_count: int = 1
+    shards: Optional[List[int]] = None
+    log_sample_rate: int = 1
+    log_rate_limit: int = 0
+    log_format: str = "text"
+    metrics_port: int = 0
+    metrics_file: str = ""
+    metrics_interval: float = 10.0
+    output_checkpoint: bool = True
+    stats_points: int = 288
+    curve_cache_size: int = 16
+    curve_cache_dir: str = ""
+    archive_after_days: int = 0
+    archive_days: int = 30
+    archive_retention_days: int = 0
+    plot_enabled: bool = True
+    broker_reconnect_delay: float = 1.0
+    broker_reconnect_max_delay: float = 30.0
+    prefetch_count: int = 100
+    pv_consumer: str = "blocking"
+    ack_batch_size: int = 50
+    ack_interval: float = 1.0
+
+    @classmethod
+    def from_env(cls, environ=None) -> "PvConfig":
+        """
+        Reads PV simulator's parameters from environment.
+        :return:
+        """
+        return read_environment(cls, {"shards": "PV_SHARDS"}, environ)
+
+    def pv_kwargs(self) -> dict:
+        """
+        Returns keyword arguments of Pv, fields without CONSUMER_FIELDS.
+        """
+        values = self._asdict()
+        for field in CONSUMER_FIELDS:
+            del values[field]
+        return values
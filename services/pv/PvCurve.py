@@ -0,0 +1,88 @@
+import numpy as np
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def get_parabola_vertex(x1: float, y1: float, x2: float, y2: float,
+                        x3: float, y3: float) -> (float, float, float):
+    """Calculate the vertex of a parabola given three points"""
+
+    denom = (x1 - x2) * (x1 - x3) * (x2 - x3)
+    A = (x3 * (y2 - y1) + x2 * (y1 - y3) + x1 * (y3 - y2)) / denom
+    B = (x3 * x3 * (y1 - y2) +
+         x2 * x2 * (y3 - y1) +
+         x1 * x1 * (y2 - y3)) / denom
+    C = (x2 * x3 * (x2 - x3) * y1 +
+         x3 * x1 * (x3 - x1) * y2 +
+         x1 * x2 * (x1 - x2) * y3) / denom
+
+    return A, B, C
+
+
+class PvCurve:
+    """
+    PV curve using a straight for SUNRISE, a parabola for ZENITH and another
+    straight for SUNDOWN. All times are fractions of the day.
+    Coefficients are computed once, so the curve can be evaluated for a
+    single time or for a whole day in one vectorized call.
+    """
+
+    def __init__(self, sunrise_start: float, sunrise_end: float,
+                 zenith: float, sundown_start: float, sundown_end: float,
+                 light_eff_lw: float, light_eff_std: float, max_power: int):
+        self._sunrise_start = sunrise_start
+        self._sunrise_end = sunrise_end
+        self._sundown_start = sundown_start
+        self._sundown_end = sundown_end
+
+        self._morning_a = (light_eff_lw * max_power) / (
+                sunrise_end - sunrise_start)
+        self._morning_b = self._morning_a * sunrise_start * -1
+        self._evening_a = ((-sunrise_end) * max_power *
+                           light_eff_lw) / (sundown_end - sundown_start)
+        self._evening_b = self._evening_a * sundown_end * -1
+        (self._parabola_a, self._parabola_b,
+         self._parabola_c) = get_parabola_vertex(
+            sunrise_end, self.morning(sunrise_end),
+            zenith, (light_eff_std * max_power),
+            sundown_start, self.evening(sundown_start))
+
+    def morning(self, x):
+        return self._morning_a * x + self._morning_b
+
+    def evening(self, x):
+        return self._evening_a * x + self._evening_b
+
+    def parabola(self, x):
+        return self._parabola_a * (x ** 2) + (self._parabola_b * x) + \
+               self._parabola_c
+
+    def value(self, time: float) -> int:
+        """Returns PV value for one time of the day"""
+        if self._sunrise_start <= time <= self._sunrise_end:
+            value = self.morning(time)
+        elif self._sunrise_end < time < self._sundown_start:
+            value = self.parabola(time)
+        elif self._sundown_start <= time <= self._sundown_end:
+            value = self.evening(time)
+        else:
+            value = 0.0
+        return int(value)
+
+    def day(self, time_iter: int) -> np.ndarray:
+        """
+        Returns PV values of a whole day indexed by iteration,
+        iteration i is at i * time_iter seconds.
+        Values are equal to value() of each time.
+        """
+        iterations = SECONDS_PER_DAY // time_iter
+        time = np.arange(iterations + 1) * time_iter / SECONDS_PER_DAY
+        morning = (time >= self._sunrise_start) & (time <= self._sunrise_end)
+        zenith = (time > self._sunrise_end) & (time < self._sundown_start)
+        evening = (time >= self._sundown_start) & (
+                time <= self._sundown_end)
+        value = np.zeros_like(time)
+        value[morning] = self.morning(time[morning])
+        value[zenith] = self.parabola(time[zenith])
+        value[evening] = self.evening(time[evening])
+        return np.trunc(value).astype(np.int64)
@@ -0,0 +1,79 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from common.LogPipeline import stop_logging
+from pv.PV import Pv
+
+
+class InMemoryChannel:
+    """
+    Channel passing published messages directly to PV simulator.
+    First error of PV simulator is kept and no more messages are passed,
+    because meter only logs errors of publishing.
+    """
+
+    def __init__(self, pv: Pv):
+        self._pv = pv
+        self.error = None
+
+    def basic_publish(self, exchange: str, routing_key: str, body,
+                      properties=None):
+        if self.error is not None:
+            return
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        try:
+            self._pv._handle_message(body,
+                                     getattr(properties, "content_type", None))
+        except Exception as e:
+            self.error = e
+
+
+def simulate_day(meter_kwargs: dict, pv_kwargs: dict, day: int) -> str:
+    """
+    Simulates one day by meter and PV simulator without broker, meter
+    publishes as fast as possible whatever its speedup is.
+    Returns name of output file of the day.
+    """
+    from meter.Meter import Meter
+
+    pv = Pv(**dict(pv_kwargs, plot_workers=0))
+    meter = Meter(**dict(meter_kwargs, speedup=0))
+    channel = InMemoryChannel(pv)
+    try:
+        meter.simulate_day(channel, day)
+    finally:
+        pv._stop()
+    if channel.error is not None:
+        raise channel.error
+    if meter_kwargs.get("meter_count", 1) > 1:
+        return pv._make_fleet_filename(day)
+    return pv._make_filename(day)
+
+
+def _simulate_day_in_worker(meter_kwargs: dict, pv_kwargs: dict,
+                            day: int) -> str:
+    try:
+        return simulate_day(meter_kwargs, pv_kwargs, day)
+    finally:
+        stop_logging()
+
+
+def simulate_days(meter_kwargs: dict, pv_kwargs: dict, first_day: int,
+                  days: int, workers: int) -> Iterator[str]:
+    """
+    Simulates days first_day..first_day + days - 1 in a pool of workers
+    processes. Yields names of output files in order of days. Workers
+    drop logging inherited from this process and write their log records
+    before every day is returned, because they exit without atexit.
+    """
+    day_range = range(first_day, first_day + days)
+    if workers <= 1:
+        for day in day_range:
+            yield simulate_day(meter_kwargs, pv_kwargs, day)
+        return
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=stop_logging) as executor:
+        yield from executor.map(_simulate_day_in_worker,
+                                [meter_kwargs] * days, [pv_kwargs] * days,
+                                day_range)
@@ -0,0 +1,116 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from pv.PvConfig import PvConfig
+from pv.PvCurve import SECONDS_PER_DAY, PvCurve
+
+HOUR_FIELDS = ("pv_sunrise_start", "pv_sunrise_end", "pv_zenith",
+               "pv_sundown_start", "pv_sundown_end")
+CURVE_FIELDS = HOUR_FIELDS + ("pv_light_eff_lw", "pv_light_eff_std",
+                              "pv_max_power")
+BALANCE = ["consumption_kwh", "pv_kwh", "self_consumed_kwh", "export_kwh",
+           "import_kwh", "net_kwh", "self_sufficiency", "peak_export",
+           "peak_import"]
+
+PARALLEL_CONFIGS = 2000
+
+_meter_day = None
+
+
+def make_grid(config: PvConfig, grid: Dict[str, Sequence]
+              ) -> List[PvConfig]:
+    """
+    Returns configs of all combinations of values of grid fields, other
+    fields are those of config. Combinations whose hours of sunrise,
+    zenith and sundown are not increasing make no curve and are skipped.
+    """
+    unknown = set(grid) - set(CURVE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown curve parameters {', '.join(unknown)}, "
+                         f"expected some of {', '.join(CURVE_FIELDS)}")
+    configs = []
+    for values in itertools.product(*grid.values()):
+        sweep_config = config._replace(**dict(zip(grid, values)))
+        hours = [getattr(sweep_config, field) for field in HOUR_FIELDS]
+        if all(earlier < later for earlier, later in zip(hours, hours[1:])):
+            configs.append(sweep_config)
+    return configs
+
+
+def get_curve_params(config: PvConfig) -> tuple:
+    """
+    Returns parameters of day curve of config, the same as
+    Pv._get_curve_params, the last one is time_iter.
+    """
+    return tuple(getattr(config, field) * 3600 / SECONDS_PER_DAY
+                 if field in HOUR_FIELDS else getattr(config, field)
+                 for field in CURVE_FIELDS) + (config.time_iter,)
+
+
+def get_day_curve(config: PvConfig) -> np.ndarray:
+    """
+    Returns PV values of a whole day of config. Every config of a sweep
+    has its own curve, so it is computed without the curve cache.
+    """
+    params = get_curve_params(config)
+    return PvCurve(*params[:-1]).day(config.time_iter)
+
+
+def evaluate(config: PvConfig, iterations: np.ndarray,
+             readings: np.ndarray) -> Dict[str, float]:
+    """
+    Returns energy balance (kWh) of meter's readings of iterations and PV
+    values of config: consumption, PV production, self consumed, exported
+    and imported energy, net sum, share of consumption covered by PV and
+    peak export and import (Watt). Readings out of pv_min..pv_max are
+    skipped, as by PV simulator.
+    """
+    in_range = (readings >= config.pv_min) & (readings <= config.pv_max)
+    meter = readings[in_range]
+    pv = get_day_curve(config)[iterations[in_range]]
+    kwh_iter = config.time_iter / 3600 / 1000
+    self_consumed = np.minimum(pv, meter)
+    surplus = pv - meter
+    consumption = meter.sum() * kwh_iter
+    return {
+        "consumption_kwh": consumption,
+        "pv_kwh": pv.sum() * kwh_iter,
+        "self_consumed_kwh": self_consumed.sum() * kwh_iter,
+        "export_kwh": surplus[surplus > 0].sum() * kwh_iter,
+        "import_kwh": -surplus[surplus < 0].sum() * kwh_iter,
+        "net_kwh": surplus.sum() * kwh_iter,
+        "self_sufficiency": self_consumed.sum() * kwh_iter / consumption
+        if consumption else 0.0,
+        "peak_export": int(max(surplus.max(initial=0), 0)),
+        "peak_import": int(max(-surplus.min(initial=0), 0)),
+    }
+
+
+def _init_worker(iterations: np.ndarray, readings: np.ndarray):
+    global _meter_day
+    _meter_day = iterations, readings
+
+
+def _evaluate_in_worker(config: PvConfig) -> Dict[str, float]:
+    return evaluate(config, *_meter_day)
+
+
+def run_sweep(configs: List[PvConfig], iterations: np.ndarray,
+              readings: np.ndarray, workers: int) -> List[Dict[str, float]]:
+    """
+    Evaluates energy balance of every config for the meter day, in a pool
+    of workers processes when there are more than PARALLEL_CONFIGS of
+    them, fewer are evaluated faster than the pool starts. The meter day
+    is passed to every worker once and configs are sent in chunks.
+    Returns balances in order of configs.
+    """
+    if workers <= 1 or len(configs) <= PARALLEL_CONFIGS:
+        return [evaluate(config, iterations, readings) for config in configs]
+    chunksize = max(1, len(configs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(iterations, readings)) as executor:
+        return list(executor.map(_evaluate_in_worker, configs,
+                                 chunksize=chunksize))
@@ -1,47 +1,149 @@
-import logging
+import argparse
 import os
-import time
-from datetime import datetime
-from functools import wraps
 
-from pv.PV import Pv
+from pv.PV import Pv, make_day_filename, make_output_prefix
+from pv.PvConfig import PvConfig
+
+
+def parse_hours(value: str) -> tuple:
+    """
+    Parses hours of days "first-last" or "hour" to (first, last) tuple.
+    """
+    first_hour, _, last_hour = value.partition("-")
+    try:
+        hours = int(first_hour), int(last_hour or first_hour)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid hours {value!r}")
+    if not 0 <= hours[0] <= hours[1] <= 23:
+        raise argparse.ArgumentTypeError(
+            f"hours {value!r} must be within 0-23, first not after last")
+    return hours
+
+
+def get_pv_kwargs() -> dict:
+    """
+    Reads PV simulator's parameters from environment.
+    :return:
+    """
+    return PvConfig.from_env().pv_kwargs()
+
+
+def query_days(config: PvConfig, args: argparse.Namespace):
+    """
+    Updates index of day files and prints summaries of days and their
+    total in format of summary file.
+    """
+    from pv.DayIndex import DayIndex, aggregate
+    from pv.DayStats import SUMMARY_HEADER, format_summary
+    day_index = DayIndex(
+        make_output_prefix(config.output_file),
+        make_day_filename(config.output_file, config.output_format, "{day}"),
+        config.output_format, config.delimiter, config.time_iter,
+        args.workers).update()
+    summaries = day_index.query(args.first_day, args.last_day, args.hours)
+    print(config.delimiter.join(SUMMARY_HEADER))
+    if args.per_day:
+        for meter_day, summary in summaries.items():
+            print(format_summary(meter_day, summary, config.delimiter))
+    if summaries:
+        print(format_summary(f"{min(summaries)}-{max(summaries)}",
+                             aggregate(summaries.values()), config.delimiter))
+
+
+def sweep_configs(config: PvConfig, args: argparse.Namespace):
+    """
+    Evaluates grid of PV curve parameters for one meter day and prints
+    parameters and energy balance of every configuration.
+    """
+    from common.Config import parse_value
+    from meter.Meter import Meter
+    from meter.MeterConfig import MeterConfig
+    from pv.Sweep import BALANCE, CURVE_FIELDS, make_grid, run_sweep
+    grid = {}
+    for parameter in args.grid:
+        field, _, values = parameter.partition("=")
+        grid[field] = [parse_value(value, PvConfig.__annotations__.get(
+            field, str)) for value in values.split(",")]
+    configs = make_grid(config, grid)
+    meter_config = MeterConfig.from_env()
+    if args.replay_file:
+        meter_config = meter_config._replace(replay_file=args.replay_file)
+    iterations, readings = Meter.from_config(meter_config).get_day_readings(
+        args.day)
+    balances = run_sweep(configs, iterations, readings, args.workers)
+    print(config.delimiter.join(list(CURVE_FIELDS) + BALANCE))
+    for sweep_config, balance in zip(configs, balances):
+        values = [str(getattr(sweep_config, field)) for field in CURVE_FIELDS]
+        values += [f"{balance[name]:.3f}" if isinstance(balance[name], float)
+                   else str(balance[name]) for name in BALANCE]
+        print(config.delimiter.join(values))
 
 
 def main():
     """
     Initializes PV and starts PV simulator.
+    "simulate" command runs meter and PV simulator in one process
+    without broker. "query" command prints summaries of finished days
+    from index of day files. "sweep" command evaluates energy balance of
+    a grid of PV curve parameters.
     :return:
     """
-    BROKER_HOST = os.environ.get('BROKER_HOST', 'rabbitmq')
-    BROKER_PORT = os.environ.get('BROKER_PORT', '5672')
-    BROKER_QUEUE = os.environ.get('BROKER_QUEUE', 'meter_simulator')
-    BROKER_USERNAME = os.environ.get('BROKER_USERNAME', 'guest')
-    BROKER_PASSWORD = os.environ.get('BROKER_PASSWORD', 'guest')
-    PV_MIN = int(os.environ.get('PV_MIN', 0))
-    PV_MAX = int(os.environ.get('PV_MAX', 9000))
-    OUTPUT_FILE = os.environ.get('OUTPUT_FILE', 'output.csv')
-    DELIMITER = os.environ.get('DELIMITER', ';')
-    LOGFILE = os.environ.get('LOGFILE', './log/pv.log')
-    ENVIRONMENT_PV = os.environ.get('ENVIRONMENT_PV', 'DEV')
-    MAX_EXECUTE_TIME = int(os.environ.get('MAX_EXECUTE_TIME', 60))
-    TIME_ITER = int(os.environ.get('TIME_ITER', 60))
-    EXECUTE_TIME_LOG = os.environ.get('EXECUTE_TIME_LOG',
-                                      './log/execute_time.log')
-    PV_SUNRISE_START = int(os.environ.get('PV_SUNRISE_START', 6))
-    PV_SUNRISE_END = int(os.environ.get('PV_SUNRISE_END', 8))
-    PV_ZENITH = int(os.environ.get('PV_ZENITH', 14))
-    PV_SUNDOWN_START = int(os.environ.get('PV_SUNDOWN_START', 20))
-    PV_SUNDOWN_END = int(os.environ.get('PV_SUNDOWN_END', 21))
-    PV_LIGHT_EFF_LW = float(os.environ.get('PV_LIGHT_EFF_LW', 0.1))
-    PV_LIGHT_EFF_STD = float(os.environ.get('PV_LIGHT_EFF_STD', 0.8125))
-    PV_MAX_POWER = int(os.environ.get('PV_MAX_POWER', 4000))
-
-    pv = Pv(BROKER_HOST, BROKER_PORT, BROKER_QUEUE, BROKER_USERNAME,
-            BROKER_PASSWORD, PV_MIN, PV_MAX, OUTPUT_FILE,
-            DELIMITER, LOGFILE, ENVIRONMENT_PV, MAX_EXECUTE_TIME, TIME_ITER,
-            EXECUTE_TIME_LOG, PV_SUNRISE_START, PV_SUNRISE_END, PV_ZENITH,
-            PV_SUNDOWN_START, PV_SUNDOWN_END, PV_LIGHT_EFF_LW, PV_LIGHT_EFF_STD,
-            PV_MAX_POWER)
+    parser = argparse.ArgumentParser(prog="python -m pv")
+    commands = parser.add_subparsers(dest="command")
+    simulate = commands.add_parser(
+        "simulate", help="simulate days without broker")
+    simulate.add_argument("--days", type=int, default=1,
+                          help="quantity of simulated days")
+    simulate.add_argument("--first-day", type=int, default=0,
+                          help="number of first simulated day")
+    simulate.add_argument("--workers", type=int, default=os.cpu_count(),
+                          help="quantity of days simulated in parallel")
+    query = commands.add_parser(
+        "query", help="aggregate finished days from index of day files")
+    query.add_argument("--first-day", type=int, help="first day of range")
+    query.add_argument("--last-day", type=int, help="last day of range")
+    query.add_argument("--hours", type=parse_hours,
+                       help="hours of days 0-23, e.g. 10-14")
+    query.add_argument("--per-day", action="store_true",
+                       help="print summary of every day")
+    query.add_argument("--workers", type=int, default=os.cpu_count(),
+                       help="quantity of day files scanned in parallel")
+    sweep = commands.add_parser(
+        "sweep", help="evaluate energy balance of grid of PV parameters")
+    sweep.add_argument("--grid", action="append", default=[],
+                       metavar="FIELD=VALUE,...",
+                       help="values of PV curve parameter, e.g. "
+                            "pv_zenith=12,13,14")
+    sweep.add_argument("--day", type=int, default=0,
+                       help="day of generated meter's readings")
+    sweep.add_argument("--replay-file",
+                       help="recorded day file with meter's readings")
+    sweep.add_argument("--workers", type=int, default=os.cpu_count(),
+                       help="quantity of configurations evaluated in "
+                            "parallel")
+    args = parser.parse_args()
+
+    if args.command == "simulate":
+        from meter.__main__ import get_meter_kwargs
+        from pv.Simulation import simulate_days
+        for filename in simulate_days(get_meter_kwargs(), get_pv_kwargs(),
+                                      args.first_day, args.days,
+                                      args.workers):
+            print(f"Simulated {filename}")
+        return
+    if args.command == "query":
+        query_days(PvConfig.from_env(), args)
+        return
+    if args.command == "sweep":
+        sweep_configs(PvConfig.from_env(), args)
+        return
+
+    config = PvConfig.from_env()
+    if config.pv_consumer == 'async':
+        from pv.AsyncPv import AsyncPv
+        pv = AsyncPv.from_config(config)
+    else:
+        pv = Pv.from_config(config)
     pv.start()
 
 
@@ -4,4 +4,4 @@ while ! nc -z rabbitmq 5672; do
   sleep 0.1
 done
 echo "PostgreSQL started"
-python -m pv
\ No newline at end of file
+exec python -m pv
\ No newline at end of file
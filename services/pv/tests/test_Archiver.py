@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+
+from pv.Archiver import ArchiveReader, DayArchiver
+
+
+class testArchiver(unittest.TestCase):
+    """
+    Class for testing archiving of day files.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.directory.name, "output")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get_filenames(self, meter_day: int) -> list:
+        return [f"{self.prefix}_day{meter_day}.csv",
+                f"{self.prefix}_day{meter_day}.png",
+                f"{self.prefix}_day{meter_day}_fleet.csv"]
+
+    def make_day(self, meter_day: int):
+        for filename in self.get_filenames(meter_day)[:2]:
+            with open(filename, "w") as day_file:
+                day_file.write(f"day {meter_day}\n" * 100)
+
+    def test_archive_day(self):
+        archiver = DayArchiver(self.prefix, self.get_filenames, 1,
+                               days_per_archive=2)
+        for meter_day in range(3):
+            self.make_day(meter_day)
+            archiver.day_finished(meter_day)
+        archiver.close()
+        assert sorted(os.listdir(self.directory.name)) == [
+            "output_archive_index.json", "output_archive_index.json.lock",
+            "output_day2.csv", "output_day2.png", "output_month0.zip"]
+        reader = ArchiveReader(self.prefix)
+        assert reader.days() == [0, 1]
+        assert reader.members(1) == ["output_day1.csv", "output_day1.png"]
+        assert reader.read(1, "output_day1.csv") == b"day 1\n" * 100
+        assert reader.read(1, "output_day1.csv", 6, 18) == b"day 1\n" * 2
+        with self.assertRaises(KeyError):
+            reader.read(2, "output_day2.csv")
+
+    def test_replace_day(self):
+        archiver = DayArchiver(self.prefix, self.get_filenames, 1)
+        for meter_day in range(3):
+            self.make_day(meter_day)
+            archiver.day_finished(meter_day)
+        archiver.close()
+        with open(self.get_filenames(0)[0], "w") as day_file:
+            day_file.write("day 0 again\n")
+        archiver = DayArchiver(self.prefix, self.get_filenames, 1)
+        archiver.day_finished(1)
+        archiver.close()
+        reader = ArchiveReader(self.prefix)
+        assert reader.read(0, "output_day0.csv") == b"day 0 again\n"
+        assert reader.read(0, "output_day0.png") == b"day 0\n" * 100
+        assert reader.read(1, "output_day1.csv") == b"day 1\n" * 100
+        assert not os.path.isfile(self.get_filenames(0)[0])
+
+    def test_retention(self):
+        archiver = DayArchiver(self.prefix, self.get_filenames, 1,
+                               days_per_archive=2, retention_days=2)
+        for meter_day in range(6):
+            self.make_day(meter_day)
+            archiver.day_finished(meter_day)
+        archiver.close()
+        assert ArchiveReader(self.prefix).days() == [2, 3, 4]
+        assert not os.path.isfile(f"{self.prefix}_month0.zip")
+
+    def test_shard_days(self):
+        plotted = Future()
+        archiver = DayArchiver(self.prefix, self.get_filenames, 1,
+                               owns_day=lambda meter_day: meter_day % 2 == 0,
+                               get_pending={0: plotted}.get)
+        for meter_day in range(5):
+            self.make_day(meter_day)
+        for meter_day in (0, 2, 4):
+            archiver.day_finished(meter_day)
+
+        def plot():
+            with open(self.get_filenames(0)[1], "w") as plot_file:
+                plot_file.write("plot")
+            plotted.set_result(None)
+
+        threading.Timer(0.1, plot).start()
+        archiver.close()
+        reader = ArchiveReader(self.prefix)
+        assert reader.days() == [0, 2]
+        assert reader.read(0, "output_day0.png") == b"plot"
+        assert os.path.isfile(f"{self.prefix}_day1.csv")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import aio_pika
+
+from pv.AsyncPv import AsyncPv
+
+
+class FakeMessage:
+    headers = None
+    content_type = None
+
+    def __init__(self, body: bytes, acks: list):
+        self.body = body
+        self._acks = acks
+
+    async def ack(self, multiple: bool = False):
+        self._acks.append((self.body, multiple))
+
+    async def reject(self):
+        self._acks.append((self.body, "reject"))
+
+
+class testAsyncPv(unittest.TestCase, AsyncPv):
+    """
+    Class for testing async PV consumer.
+    """
+    _ack_batch_size = 2
+    _ack_interval = 60.0
+    _broker_host = "rabbitmq"
+    _broker_port = "5672"
+    _broker_username = "guest"
+    _broker_password = "guest"
+    _broker_reconnect_delay = 0.0
+    _broker_reconnect_max_delay = 0.0
+
+    def _handle_message(self, body: bytes, content_type: str = None):
+        if body == b"BAD":
+            raise ValueError("BAD")
+        if body == b"STOP":
+            raise KeyboardInterrupt
+        self.handled.append(body)
+
+    def _flush_output(self):
+        self.handled.append(b"FLUSH")
+
+    def test_process_messages(self):
+        self.handled = []
+        acks = []
+
+        async def consume():
+            messages = asyncio.Queue()
+            for body in (b"1", b"2", b"BAD", b"3", b"4", b"STOP"):
+                messages.put_nowait(FakeMessage(body, acks))
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                await self._process_messages(messages, executor)
+
+        with self.assertRaises(KeyboardInterrupt):
+            asyncio.run(consume())
+        assert self.handled == [b"1", b"2", b"FLUSH", b"3", b"4", b"FLUSH"]
+        assert acks == [(b"2", True), (b"BAD", "reject"), (b"4", True)]
+
+    def test_connect_retries(self):
+        connection = object()
+        connect = mock.AsyncMock(side_effect=[
+            ConnectionRefusedError("refused"),
+            aio_pika.exceptions.AMQPConnectionError("closed"), connection])
+        with mock.patch("aio_pika.connect_robust", connect):
+            assert asyncio.run(self._connect()) is connection
+        assert connect.call_count == 3
+
+    def test_drop_unacked(self):
+        messages = asyncio.Queue()
+        messages.put_nowait(FakeMessage(b"1", []))
+        self._unacked = FakeMessage(b"0", [])
+        self._unacked_headers = [None]
+        self._drop_unacked(messages)
+        assert self._unacked is None and not self._unacked_headers
+        assert messages.empty()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from pv.CurveCache import CurveCache, get_curve_cache, make_key
+
+
+class testCurveCache(unittest.TestCase):
+    """
+    Class for testing cache of day curves.
+    """
+
+    def setUp(self):
+        self.made = []
+
+    def make_curve(self, value: int):
+        def make():
+            self.made.append(value)
+            return np.full(4, value)
+        return make
+
+    def test_get(self):
+        curve_cache = CurveCache(2)
+        curve = curve_cache.get((1, 60), self.make_curve(1))
+        assert curve.tolist() == [1, 1, 1, 1]
+        assert not curve.flags.writeable
+        assert curve_cache.get((1, 60), self.make_curve(1)) is curve
+        assert self.made == [1]
+
+    def test_eviction(self):
+        curve_cache = CurveCache(2)
+        curve_cache.get((1,), self.make_curve(1))
+        curve_cache.get((2,), self.make_curve(2))
+        curve_cache.get((1,), self.make_curve(1))
+        curve_cache.get((3,), self.make_curve(3))
+        assert len(curve_cache) == 2
+        curve_cache.get((1,), self.make_curve(1))
+        curve_cache.get((2,), self.make_curve(2))
+        assert self.made == [1, 2, 3, 2]
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            curve = CurveCache(2, directory).get((1,), self.make_curve(1))
+            assert isinstance(curve, np.memmap)
+            assert os.path.isfile(os.path.join(
+                directory, f"pv_curve_{make_key((1,))}.npy"))
+            loaded = CurveCache(2, directory).get((1,), self.make_curve(1))
+            assert loaded.tolist() == curve.tolist()
+            assert self.made == [1]
+
+    def test_shared(self):
+        assert get_curve_cache(4) is get_curve_cache(4)
+        assert get_curve_cache(4) is not get_curve_cache(4, "curves")
+
+
+if __name__ == "__main__":
+    unittest.main()
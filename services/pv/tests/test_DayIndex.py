@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from pv.Archiver import DayArchiver
+from pv.DayIndex import DayIndex, aggregate
+from pv.DayStats import DayStats
+from pv.DayWriter import DAY_WRITERS, DayRecord
+from pv.PV import make_day_filename
+
+
+class testDayIndex(unittest.TestCase):
+    """
+    Class for testing index and queries of day files.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.directory.name, "output")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_index(self, output_format: str = "csv") -> DayIndex:
+        return DayIndex(self.prefix,
+                        make_day_filename(self.prefix + ".csv", output_format,
+                                          "{day}"),
+                        output_format, ";", 60, workers=1)
+
+    def make_day(self, meter_day: int, output_format: str = "csv"
+                 ) -> DayStats:
+        day_stats = DayStats(60, 288)
+        filename = make_day_filename(self.prefix + ".csv", output_format,
+                                     meter_day)
+        day_writer = DAY_WRITERS[output_format](filename, ";", 100, 5.0)
+        for iteration in range(1, 1441):
+            meter = (iteration * 7 + meter_day) % 9000
+            record = DayRecord(iteration, -meter, iteration, iteration - meter)
+            day_writer.write(record)
+            day_stats.add(*record)
+        day_writer.close()
+        return day_stats
+
+    def test_query(self):
+        for output_format in ("csv", "npy"):
+            days = [self.make_day(meter_day, output_format)
+                    for meter_day in range(3)]
+            summaries = self.make_index(output_format).update().query(1)
+            assert list(summaries) == [1, 2]
+            assert summaries[2] == days[2].summary()
+            total = aggregate(summaries.values())
+            assert total["days"] == 2 and total["readings"] == 2880
+            assert total["pv_kwh"] == days[1].summary()["pv_kwh"] * 2
+            assert total["meter_min"] == min(days[1].summary()["meter_min"],
+                                             days[2].summary()["meter_min"])
+
+    def test_query_hours(self):
+        self.make_day(0)
+        summaries = self.make_index().update().query(hours=(10, 11))
+        assert summaries[0]["readings"] == 120
+        assert summaries[0]["pv_min"] == 600
+        assert summaries[0]["pv_max"] == 719
+
+    def test_update(self):
+        self.make_day(0)
+        self.make_day(1)
+        day_index = self.make_index().update()
+        entry = dict(day_index.days["0"])
+        self.make_day(1)
+        os.remove(make_day_filename(self.prefix + ".csv", "csv", 0))
+        self.make_day(2)
+        day_index = self.make_index().update()
+        assert sorted(day_index.days) == ["1", "2"]
+        assert day_index.days["1"]["summary"]["readings"] == 2880
+        assert entry["summary"]["readings"] == 1440
+
+    def test_archived(self):
+        expected = self.make_day(0).summary()
+        self.make_index().update()
+        archiver = DayArchiver(self.prefix, lambda meter_day: [
+            make_day_filename(self.prefix + ".csv", "csv", meter_day)], 0)
+        expected_day1 = self.make_day(1).summary()
+        archiver.day_finished(0)
+        archiver.day_finished(1)
+        archiver.close()
+        day_index = self.make_index().update()
+        assert day_index.days["0"]["archived"]
+        assert day_index.query(hours=(0, 23)) == {0: expected,
+                                                   1: expected_day1}
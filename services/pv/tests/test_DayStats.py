@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from pv.DayStats import SUMMARY_HEADER, DayStats
+
+
+class testDayStats(unittest.TestCase):
+    """
+    Class for testing running statistics of a day.
+    """
+
+    def test_summary(self):
+        day_stats = DayStats(3600, 24)
+        day_stats.add(1, -1000, 0, -1000)
+        day_stats.add(2, -3000, 2000, -1000)
+        summary = day_stats.summary()
+        assert summary["readings"] == 2
+        assert (summary["meter_min"], summary["meter_max"]) == (-3000, -1000)
+        assert summary["pv_mean"] == 1000
+        assert summary["meter_kwh"] == -4
+        assert summary["sum_kwh"] == -2
+
+    def test_series(self):
+        day_stats = DayStats(60, 288)
+        for timestamp in range(1, 1441):
+            day_stats.add(timestamp, -timestamp, 0, -timestamp)
+        timestamps, columns = day_stats.series()
+        assert len(timestamps) == 288
+        assert timestamps[0] == 3
+        assert columns["meter"][0] == -3
+        assert columns["pv"] == [0] * 288
+
+    def test_add_rows(self):
+        rows = np.array([[1, -1000, 0, -1000], [2, -3000, 2000, -1000]])
+        assert DayStats(3600, 24).add_rows(rows).summary() == \
+               DayStats(3600, 24).add_rows(rows[::-1]).summary()
+
+    def test_write_summary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "output_summary.csv")
+            day_stats = DayStats(3600, 24)
+            day_stats.add(1, -1000, 0, -1000)
+            day_stats.write_summary(filename, 0, ";")
+            day_stats.write_summary(filename, 1, ";")
+            with open(filename) as summary_file:
+                lines = summary_file.read().splitlines()
+        assert lines[0].split(";") == SUMMARY_HEADER
+        assert len(lines) == 3
+        assert lines[2].split(";")[:3] == ["1", "1", "-1000"]
+
+
+if __name__ == "__main__":
+    unittest.main()
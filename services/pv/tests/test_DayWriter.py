@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+
+from pv.DayWriter import (DayWriter, NpyDayWriter, read_checkpoint,
+                          read_day)
+
+
+class testDayWriter(unittest.TestCase):
+    """
+    Class for testing buffered day writer.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "output_day1.csv")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_buffering(self):
+        day_writer = DayWriter(self.filename, ";", 3, 60)
+        day_writer.write([1, -1234, 1234, 0])
+        assert os.path.getsize(self.filename) == 0
+        day_writer.write([2, -1234, 1234, 0])
+        assert os.path.getsize(self.filename) > 0
+        day_writer.close()
+
+    def test_close(self):
+        day_writer = DayWriter(self.filename, ";", 100, 60)
+        day_writer.write([1, -1234, 1234, 0])
+        day_writer.close()
+        with open(self.filename) as data_file:
+            assert data_file.read().splitlines() == ["timestamp;meter;pv;sum",
+                                                     "1;-1234;1234;0"]
+
+    def test_append(self):
+        DayWriter(self.filename, ";", 100, 60).close()
+        day_writer = DayWriter(self.filename, ";", 100, 60)
+        day_writer.write([1, -1234, 1234, 0])
+        day_writer.close()
+        with open(self.filename) as data_file:
+            assert len(data_file.read().splitlines()) == 2
+
+    def test_read_csv(self):
+        day_writer = DayWriter(self.filename, ";", 100, 60)
+        day_writer.write([1, -1234, 1234, 0])
+        day_writer.close()
+        assert read_day(self.filename).tolist() == [[1, -1234, 1234, 0]]
+
+    def test_npy(self):
+        filename = os.path.join(self.directory.name, "output_day1.npy")
+        day_writer = NpyDayWriter(filename, ";", 2, 60)
+        for timestamp in range(1, 6):
+            day_writer.write((timestamp, -1234, 1234, 0))
+        day_writer.close()
+        data_day = read_day(filename)
+        assert data_day.dtype == "int32"
+        assert data_day.shape == (5, 4)
+        assert data_day[:, 0].tolist() == [1, 2, 3, 4, 5]
+
+    def test_npy_append(self):
+        filename = os.path.join(self.directory.name, "output_day1.npy")
+        day_writer = NpyDayWriter(filename, ";", 100, 60)
+        day_writer.write((1, -1234, 1234, 0))
+        day_writer.close()
+        day_writer = NpyDayWriter(filename, ";", 100, 60)
+        day_writer.write((2, -1234, 1234, 0))
+        day_writer.close()
+        assert read_day(filename)[:, 0].tolist() == [1, 2]
+
+    def test_skip_duplicates(self):
+        day_writer = DayWriter(self.filename, ";", 100, 60)
+        assert day_writer.write([1, -1234, 1234, 0])
+        assert not day_writer.write([1, -1234, 1234, 0])
+        day_writer.close()
+        assert read_day(self.filename)[:, 0].tolist() == [1]
+
+    def test_late_record(self):
+        for day_writer in (DayWriter(self.filename, ";", 2, 60),
+                           NpyDayWriter(self.filename + ".npy", ";", 2, 60)):
+            for timestamp in (1, 2, 4, 3, 4, 5):
+                day_writer.write((timestamp, -1234, 1234, 0))
+            day_writer.close()
+        assert read_day(self.filename)[:, 0].tolist() == [1, 2, 3, 4, 5]
+        assert read_day(self.filename + ".npy")[:, 0].tolist() == [
+            1, 2, 3, 4, 5]
+
+    def test_checkpoint(self):
+        day_writer = DayWriter(self.filename, ";", 3, 60, checkpoint=True)
+        for timestamp in range(1, 4):
+            day_writer.write([timestamp, -1234, 1234, 0])
+        assert read_checkpoint(self.filename) == (
+            2, os.path.getsize(self.filename))
+        with open(self.filename, "a") as data_file:
+            data_file.write("3;-12")
+        day_writer = DayWriter(self.filename, ";", 2, 60, checkpoint=True)
+        assert day_writer.last_iteration == 2
+        for timestamp in (1, 2, 4, 3):
+            day_writer.write([timestamp, -1234, 1234, 0])
+        day_writer.close()
+        assert read_day(self.filename)[:, 0].tolist() == [1, 2, 3, 4]
+        assert read_checkpoint(self.filename)[0] == 4
+
+    def test_npy_checkpoint(self):
+        filename = os.path.join(self.directory.name, "output_day1.npy")
+        day_writer = NpyDayWriter(filename, ";", 2, 60, checkpoint=True)
+        for timestamp in range(1, 4):
+            day_writer.write((timestamp, -1234, 1234, 0))
+        day_writer = NpyDayWriter(filename, ";", 2, 60, checkpoint=True)
+        for timestamp in range(2, 5):
+            day_writer.write((timestamp, -1234, 1234, 0))
+        day_writer.close()
+        assert read_day(filename)[:, 0].tolist() == [1, 2, 3, 4]
+
+    def test_checkpoint_missing(self):
+        with open(self.filename, "w") as data_file:
+            data_file.write("timestamp;meter;pv;sum\n1;-12")
+        day_writer = DayWriter(self.filename, ";", 100, 60, checkpoint=True)
+        day_writer.write([1, -1234, 1234, 0])
+        day_writer.close()
+        assert read_day(self.filename)[:, 0].tolist() == [1]
+
+    def test_checkpoint_without_file(self):
+        with open(self.filename + ".ckpt", "w") as checkpoint_file:
+            checkpoint_file.write("1440;1000\n")
+        day_writer = DayWriter(self.filename, ";", 100, 60, checkpoint=True)
+        assert day_writer.last_iteration == 0
+        assert day_writer.write([1, -1234, 1234, 0])
+        day_writer.close()
+        assert read_day(self.filename)[:, 0].tolist() == [1]
+
+
+if __name__ == "__main__":
+    unittest.main()
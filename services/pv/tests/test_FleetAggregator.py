@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from pv.FleetAggregator import FleetAggregator
+
+
+class testFleetAggregator(unittest.TestCase):
+    """
+    Class for testing aggregation of fleet readings.
+    """
+
+    def test_add(self):
+        fleet = FleetAggregator(3600, 0, 9000)
+        fleet.add(0, np.array([1000, 2000]), 500)
+        fleet.add(2, np.array([3000]), 500)
+        fleet.add(0, np.array([1000, 10000, 3000]), 1500)
+        assert fleet.totals().tolist() == [[-2000, 2000, 0],
+                                           [-2000, 500, -1500],
+                                           [-6000, 2000, -4000]]
+
+    def test_write(self):
+        fleet = FleetAggregator(60, 0, 9000)
+        fleet.add(0, np.array([600, 1200]), 600)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "output_day1_fleet.csv")
+            fleet.write(filename, ";")
+            with open(filename) as data_file:
+                assert data_file.read().splitlines() == [
+                    "meter_id;meter;pv;sum",
+                    "0;-10.000;10.000;0.000",
+                    "1;-20.000;10.000;-10.000"]
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_file = os.path.join(directory, "fleet.csv.ckpt")
+            fleet = FleetAggregator(3600, 0, 9000, checkpoint_file)
+            assert fleet.add(0, np.array([1000, 2000]), 500, 1)
+            assert fleet.pending == 2
+            fleet.flush()
+            assert fleet.pending == 0
+            fleet = FleetAggregator(3600, 0, 9000, checkpoint_file)
+            assert not fleet.add(0, np.array([1000, 2000]), 500, 1)
+            assert fleet.add(0, np.array([1000, 2000]), 500, 2)
+            assert fleet.totals()[:, 0].tolist() == [-2000, -4000]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,16 @@
+import os
+import struct
+import time
 from datetime import datetime
 
 import pika
-from pv.PV import Pv
+from common.Protocol import get_content_type
+from pv.CurveCache import CurveCache
+from pv.DayWriter import DayRecord, read_day
+from pv.PV import PUBLISH_TO_ACK, Pv
 import unittest
 import logging
+from unittest import mock
 
 
 class testPv(unittest.TestCase, Pv):
@@ -32,6 +39,22 @@ class testPv(unittest.TestCase, Pv):
     _pv_light_eff_lw = 0.1
     _pv_light_eff_std = 0.8125
     _pv_max_power = 9000
+    _output_buffer_size = 100
+    _output_flush_interval = 5.0
+    _output_format = "csv"
+    _output_checkpoint = False
+    _day_writers = {}
+    _day_stats = {}
+    _fleets = {}
+    _plot_enabled = True
+    _stats_points = 288
+    _shard_count = 1
+    _shards = [0]
+    _broker_reconnect_delay = 1.0
+    _broker_reconnect_max_delay = 30.0
+    _prefetch_count = 3
+    _unacked_tag = None
+    _unacked_headers = []
 
     _credentials = pika.PlainCredentials(_broker_username, _broker_password)
 
@@ -57,19 +80,25 @@ class testPv(unittest.TestCase, Pv):
         except Exception:
             self.assertTrue(False)
 
+    def test_curve_cache(self):
+        self._day_curve = None
+        values = [self._generate_pv_value(1, iteration)
+                  for iteration in (0, 480, 840, 1230)]
+        self._day_curve = None
+        self._curve_cache = CurveCache(1)
+        assert [self._generate_pv_value(1, iteration)
+                for iteration in (0, 480, 840, 1230)] == values
+        assert len(self._curve_cache) == 1
+
     def test_writing(self):
         """
         Test writing pv simulator's value to output file.
         :return:
         """
         try:
-            data_record = {
-                "timestamp": 1,
-                "meter_value": "-1234",
-                "pv_value": "1234",
-                "sum": "0"
-            }
+            data_record = DayRecord(1, -1234, 1234, 0)
             self._write_to_output(1, data_record, "DATA")
+            self._close_output(1)
             self.assertTrue(True)
         except Exception:
             self.assertTrue(False)
@@ -82,12 +111,128 @@ class testPv(unittest.TestCase, Pv):
         except Exception:
             self.assertTrue(False)
 
+    def test_connection_lost(self):
+        channel = mock.Mock()
+        channel.start_consuming.side_effect = \
+            pika.exceptions.StreamLostError("Connection lost")
+        self._connection = mock.Mock()
+        self._metrics_interval = 10.0
+        assert self._get_value_from_broker(channel)
+        channel.start_consuming.side_effect = ValueError("Bad message")
+        assert not self._get_value_from_broker(channel)
+
+    def test_ack_written(self):
+        channel = mock.Mock()
+        for delivery_tag in (1, 2):
+            self._callback(channel, mock.Mock(delivery_tag=delivery_tag),
+                           None, f"DATA::5;{delivery_tag};1234".encode())
+        channel.basic_ack.assert_not_called()
+        self._callback(channel, mock.Mock(delivery_tag=3), None,
+                       b"DATA::5;3;1234")
+        channel.basic_ack.assert_called_once_with(delivery_tag=3,
+                                                  multiple=True)
+        self._callback(channel, mock.Mock(delivery_tag=4), None,
+                       b"DATA::5;4;1234")
+        self._close_output(5)
+        self._ack_written(channel)
+        channel.basic_ack.assert_called_with(delivery_tag=4, multiple=True)
+
+    def test_reject_unparsed(self):
+        channel = mock.Mock()
+        self._unacked_headers = []
+        body = struct.pack("<BBIIi", 9, 2, 1, 1, 1234)
+        self._callback(channel, mock.Mock(delivery_tag=7),
+                       mock.Mock(content_type=get_content_type()), body)
+        channel.basic_reject.assert_called_once_with(delivery_tag=7,
+                                                     requeue=False)
+        assert self._unacked_tag is None
+        channel.basic_ack.assert_not_called()
+
+    def test_replace_finished_day(self):
+        filename = self._make_filename(6)
+        with open(filename, "w") as data_file:
+            data_file.write("timestamp;meter;pv;sum\n1;-1;1;0\n")
+        self._plot_enabled = False
+        self._handle_message(b"DATA::6;2;1234")
+        self._finish_day(6)
+        assert read_day(filename)[:, 0].tolist() == [2]
+        assert not os.path.isfile(filename + ".tmp")
+        self._finish_day(6)
+        assert read_day(filename)[:, 0].tolist() == [2]
+
+    def test_finish_day_without_records(self):
+        assert self._finish_day(8) == self._make_filename(8)
+        assert not os.path.isfile(self._make_filename(8))
+
+    def test_fleet_checkpoint(self):
+        self._output_checkpoint = True
+        self._fleets = {}
+        self._unacked_headers = []
+        channel = mock.Mock()
+        fleet = b"FLEET::" + struct.pack("<IIIIii", 9, 1, 0, 2, 1000, 2000)
+        self._callback(channel, mock.Mock(delivery_tag=1), None, fleet)
+        channel.basic_ack.assert_not_called()
+        self._flush_output()
+        self._ack_written(channel)
+        channel.basic_ack.assert_called_once_with(delivery_tag=1,
+                                                  multiple=True)
+        self._fleets = {}
+        self._handle_message(fleet)
+        self._handle_message(b"FLEET::" + struct.pack("<IIIIii", 9, 2, 0, 2,
+                                                      1000, 2000))
+        filename = self._finish_day(9)
+        with open(filename) as data_file:
+            assert data_file.read().splitlines()[1].startswith(
+                "0;-33.333;")
+        assert not os.path.isfile(filename + ".ckpt")
+
     def test_parse_data_string(self):
-        assert self._parse_data_string("1;1;1234") == [1, 1, 1234]
+        assert self._parse_data_string("1;1;1234") == (1, 1, 1234)
+
+    def test_parse_batch(self):
+        body = b"BATCH::" + struct.pack("<II", 1, 2) + \
+               struct.pack("<IiIi", 1, 1234, 2, 4321)
+        assert self._parse_batch(body) == (1, [(1, 1234), (2, 4321)])
+
+    def test_parse_batch_truncated(self):
+        body = b"BATCH::" + struct.pack("<II", 1, 2) + struct.pack("<Ii", 1, 1)
+        with self.assertRaises(ValueError):
+            self._parse_batch(body)
+
+    def test_publish_to_ack(self):
+        count = PUBLISH_TO_ACK.count
+        self._observe_publish_to_ack({"published_at": time.time()})
+        self._observe_publish_to_ack({})
+        self._observe_publish_to_ack(None)
+        assert PUBLISH_TO_ACK.count == count + 1
+
+    def test_get_queues(self):
+        assert self._get_queues() == ["meter_simulator_test"]
+        assert self._get_queue_arguments() is None
+        self._shard_count = 4
+        self._shards = [1, 3]
+        assert self._get_queues() == ["meter_simulator_test.1",
+                                      "meter_simulator_test.3"]
+        assert self._get_queue_arguments() == {
+            "x-single-active-consumer": True}
+
+    def test_parse_fleet(self):
+        body = b"FLEET::" + struct.pack("<IIIIii", 1, 2, 10, 2, 1234, 4321)
+        meter_day, meter_iteration, first_meter, meter_values = \
+            self._parse_fleet(body)
+        assert (meter_day, meter_iteration, first_meter) == (1, 2, 10)
+        assert meter_values.tolist() == [1234, 4321]
+
+    def test_make_fleet_filename(self):
+        assert self._make_fleet_filename(1) == \
+               "./log/output_test_day1_fleet.csv"
 
     def test_make_filename(self):
         assert self._make_filename(1) == "./log/output_test_day1.csv"
 
+    def test_make_summary_filename(self):
+        assert self._make_summary_filename() == "./log/output_test_summary.csv"
+
     def test_make_plot_filename(self):
         assert self._make_plot_filename(1) == "./log/output_test_day1.png"
 
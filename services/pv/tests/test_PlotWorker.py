@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from pv.DayWriter import DayWriter
+from pv.PlotWorker import (PlotWorker, init_backend, render_plot,
+                           render_series)
+
+
+class testPlotWorker(unittest.TestCase):
+    """
+    Class for testing background plot rendering.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "output_day1.csv")
+        self.plot_filename = os.path.join(self.directory.name,
+                                          "output_day1.png")
+        day_writer = DayWriter(self.filename, ";", 100, 60)
+        for timestamp in range(1, 10):
+            day_writer.write([timestamp, -1234, 1234, 0])
+        day_writer.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_render_plot(self):
+        init_backend()
+        render_plot(self.filename, self.plot_filename, "csv", ";")
+        assert os.path.isfile(self.plot_filename)
+
+    def test_render_series(self):
+        init_backend()
+        render_series(self.plot_filename, [1, 2, 3],
+                      {"meter": [-1, -2, -3], "pv": [1, 2, 3]})
+        assert os.path.isfile(self.plot_filename)
+
+    def test_plot_worker_series(self):
+        plot_worker = PlotWorker(1, 1)
+        future = plot_worker.submit_series(self.plot_filename, [1, 2],
+                                           {"meter": [-1, -2]})
+        plot_worker.close()
+        assert future.exception() is None
+        assert os.path.isfile(self.plot_filename)
+
+    def test_plot_worker(self):
+        plot_worker = PlotWorker(1, 1)
+        future = plot_worker.submit(self.filename, self.plot_filename, "csv",
+                                    ";")
+        plot_worker.close()
+        assert future.exception() is None
+        assert os.path.isfile(self.plot_filename)
+
+    def test_plot_worker_error(self):
+        plot_worker = PlotWorker(1, 1)
+        future = plot_worker.submit(self.filename + ".missing",
+                                    self.plot_filename, "csv", ";")
+        plot_worker.close()
+        assert future.exception() is not None
+        assert not os.path.isfile(self.plot_filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import inspect
+import unittest
+
+from pv.AsyncPv import AsyncPv
+from pv.PV import Pv
+from pv.PvConfig import CONSUMER_FIELDS, PvConfig
+
+
+class testPvConfig(unittest.TestCase):
+    """
+    Class for testing config of PV simulator.
+    """
+
+    def test_fields(self):
+        parameters = inspect.signature(Pv).parameters
+        assert [field for field in PvConfig._fields
+                if field not in CONSUMER_FIELDS] == list(parameters)
+        assert PvConfig._fields[-len(CONSUMER_FIELDS):] == CONSUMER_FIELDS
+
+    def test_from_env(self):
+        config = PvConfig.from_env({"PV_MAX": "5000", "PV_SHARDS": "1,3",
+                                    "PLOT_ENABLED": "0",
+                                    "PV_CONSUMER": "async"})
+        assert config.pv_max == 5000
+        assert config.shards == [1, 3]
+        assert config.plot_enabled is False
+        assert config.output_file == "output.csv"
+        assert config.pv_consumer == "async"
+
+    def test_from_config(self):
+        config = PvConfig(logfile="./log/pv_log.log", plot_workers=0,
+                          plot_enabled=False)
+        pv = AsyncPv.from_config(config._replace(prefetch_count=10,
+                                                 ack_batch_size=7))
+        assert pv._prefetch_count == 10
+        assert pv._ack_batch_size == 7
+        assert not pv._plot_enabled
+        pv._stop()
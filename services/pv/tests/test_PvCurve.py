@@ -0,0 +1,30 @@
+from pv.PvCurve import PvCurve, SECONDS_PER_DAY
+import unittest
+
+
+class testPvCurve(unittest.TestCase):
+    """
+    Class for testing vectorized PV curve.
+    """
+
+    def setUp(self):
+        self.curve = PvCurve(6 / 24, 8 / 24, 14 / 24, 20 / 24, 21 / 24,
+                             0.1, 0.8125, 9000)
+
+    def test_day_length(self):
+        assert len(self.curve.day(60)) == SECONDS_PER_DAY // 60 + 1
+
+    def test_day_equals_scalar(self):
+        for time_iter in (1, 60, 7):
+            day_curve = self.curve.day(time_iter)
+            for iteration, value in enumerate(day_curve):
+                time = iteration * time_iter / SECONDS_PER_DAY
+                assert value == self.curve.value(time), (time_iter, iteration)
+
+    def test_night(self):
+        assert self.curve.value(0) == 0
+        assert self.curve.value(1) == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
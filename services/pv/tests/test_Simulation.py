@@ -0,0 +1,89 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pv
+from pv.Simulation import simulate_day, simulate_days
+
+
+@unittest.skipUnless(importlib.util.find_spec("meter"),
+                     "meter package is not installed")
+class testSimulation(unittest.TestCase):
+    """
+    Class for testing offline simulation without broker.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        log = self.directory.name
+        self.meter_kwargs = dict(
+            broker_host="rabbitmq", broker_port="5672",
+            broker_queue="meter_simulator_test", broker_username="guest",
+            broker_password="guest", pv_min=0, pv_max=9000, time_iter=60,
+            logfile=os.path.join(log, "meter.log"), environment_pv="TEST",
+            delimiter=";", max_consume=14, batch_size=60, seed=1)
+        self.pv_kwargs = dict(
+            broker_host="rabbitmq", broker_port="5672",
+            broker_queue="meter_simulator_test", broker_username="guest",
+            broker_password="guest", pv_min=0, pv_max=9000,
+            output_file=os.path.join(log, "output.csv"), delimiter=";",
+            logfile=os.path.join(log, "pv.log"), environment_pv="TEST",
+            max_execute_time=60, time_iter=60,
+            execute_time_log=os.path.join(log, "execute_time.log"),
+            pv_sunrise_start=6, pv_sunrise_end=8, pv_zenith=14,
+            pv_sundown_start=20, pv_sundown_end=21, pv_light_eff_lw=0.1,
+            pv_light_eff_std=0.8125, pv_max_power=9000)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_simulate_day(self):
+        filename = simulate_day(self.meter_kwargs, self.pv_kwargs, 3)
+        assert filename.endswith("output_day3.csv")
+        with open(filename) as data_file:
+            first_run = data_file.read()
+        assert len(first_run.splitlines()) == 1441
+        simulate_day(self.meter_kwargs, self.pv_kwargs, 3)
+        with open(filename) as data_file:
+            assert data_file.read() == first_run
+
+    def test_binary_encoding(self):
+        contents = []
+        for message_encoding in ("text", "binary"):
+            filename = simulate_day(
+                dict(self.meter_kwargs, batch_size=1,
+                     message_encoding=message_encoding),
+                dict(self.pv_kwargs, output_file=os.path.join(
+                    self.directory.name, f"{message_encoding}.csv")), 1)
+            with open(filename) as data_file:
+                contents.append(data_file.read())
+        assert len(contents[0].splitlines()) == 1441
+        assert contents[0] == contents[1]
+
+    def test_no_plot(self):
+        code = ("import sys\n"
+                "from pv.Simulation import simulate_day\n"
+                f"simulate_day({self.meter_kwargs!r}, "
+                f"{dict(self.pv_kwargs, plot_enabled=False)!r}, 0)\n"
+                "assert 'matplotlib' not in sys.modules\n"
+                "assert 'pandas' not in sys.modules\n")
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       cwd=os.path.dirname(os.path.dirname(pv.__file__)))
+        assert os.path.isfile(os.path.join(self.directory.name,
+                                           "output_day0.csv"))
+        assert not os.path.isfile(os.path.join(self.directory.name,
+                                               "output_day0.png"))
+
+    def test_simulate_days(self):
+        filenames = list(simulate_days(dict(self.meter_kwargs, speedup=1000),
+                                       self.pv_kwargs, 0, 3, 2))
+        assert [os.path.basename(filename) for filename in filenames] == [
+            "output_day0.csv", "output_day1.csv", "output_day2.csv"]
+        assert all(os.path.isfile(filename) for filename in filenames)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from pv.DayStats import DayStats
+from pv.DayWriter import read_day
+from pv.PV import Pv
+from pv.PvConfig import PvConfig
+from pv.Simulation import simulate_day
+from pv.Sweep import evaluate, get_curve_params, make_grid, run_sweep
+
+
+@unittest.skipUnless(importlib.util.find_spec("meter"),
+                     "meter package is not installed")
+class testSweep(unittest.TestCase):
+    """
+    Class for testing sweep of PV curve parameters.
+    """
+
+    def setUp(self):
+        from meter.MeterConfig import MeterConfig
+        self.directory = tempfile.TemporaryDirectory()
+        log = self.directory.name
+        self.config = PvConfig(
+            output_file=os.path.join(log, "output.csv"),
+            logfile=os.path.join(log, "pv.log"),
+            execute_time_log=os.path.join(log, "execute_time.log"),
+            plot_enabled=False)
+        self.meter_config = MeterConfig(logfile=os.path.join(log, "meter.log"),
+                                        seed=1)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_make_grid(self):
+        configs = make_grid(self.config, {"pv_zenith": [12, 14],
+                                          "pv_max_power": [3000, 4000]})
+        assert [(config.pv_zenith, config.pv_max_power)
+                for config in configs] == [(12, 3000), (12, 4000),
+                                           (14, 3000), (14, 4000)]
+        assert configs[0].output_file == self.config.output_file
+        with self.assertRaises(ValueError):
+            make_grid(self.config, {"output_file": ["other.csv"]})
+        assert len(make_grid(self.config, {"pv_zenith": [14, 20, 22]})) == 1
+
+    def test_curve_params(self):
+        pv = Pv.from_config(self.config)
+        assert get_curve_params(self.config) == pv._get_curve_params()
+        pv._stop()
+
+    def test_evaluate_equals_simulation(self):
+        filename = simulate_day(self.meter_config._asdict(),
+                                self.config.pv_kwargs(), 2)
+        summary = DayStats(60, 1).add_rows(read_day(filename, ";")).summary()
+        from meter.Meter import Meter
+        iterations, readings = Meter.from_config(
+            self.meter_config).get_day_readings(2)
+        balance = evaluate(self.config, iterations, readings)
+        assert np.isclose(balance["pv_kwh"], summary["pv_kwh"])
+        assert np.isclose(balance["consumption_kwh"], -summary["meter_kwh"])
+        assert np.isclose(balance["net_kwh"], summary["sum_kwh"])
+        assert np.isclose(balance["self_consumed_kwh"] +
+                          balance["export_kwh"], balance["pv_kwh"])
+
+    def test_run_sweep(self):
+        configs = make_grid(self.config, {"pv_zenith": [12, 13, 14],
+                                          "pv_light_eff_std": [0.7, 0.8]})
+        from meter.Meter import Meter
+        iterations, readings = Meter.from_config(
+            self.meter_config).get_day_readings(0)
+        with mock.patch("pv.Sweep.PARALLEL_CONFIGS", 0):
+            balances = run_sweep(configs, iterations, readings, 2)
+        assert balances == [evaluate(config, iterations, readings)
+                            for config in configs]